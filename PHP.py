@@ -1,64 +1,105 @@
-import objectrest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
+import fetch
+from history import HistoryStore, PACKAGIST
+from metrics import bind_caller, instrument
+from series import DatedStat, DownloadSeries
 
+
+INTERVALS = ("daily", "weekly", "monthly")
+
+
+def _info_url(package_str: str) -> str:
+    return f'https://packagist.org/packages/{package_str}.json'
+
+
+def _stats_url(package_str: str, stats_type: str = "daily", start_date: datetime = None) -> str:
+    url = f'https://packagist.org/packages/{package_str}/stats/all.json?average={stats_type}'
+    if start_date:
+        url += f'&from={start_date.strftime("%Y-%m-%d")}'
+    return url
+
+
+def _version_stats_url(package_str: str, version: str, stats_type: str = "daily") -> str:
+    return f'https://packagist.org/packages/{package_str}/stats/{version}.json?average={stats_type}'
+
+
+@instrument
 def _info_api_call(package_str: str):
-    return objectrest.get_json(
-        f'https://packagist.org/packages/{package_str}.json').get('package')
+    return fetch.get_json(_info_url(package_str=package_str)).get('package')
 
 
-def _stats_api_call(package_str: str, stats_type: str = "daily"):
-    return objectrest.get_json(
-        f'https://packagist.org/packages/{package_str}/stats/all.json?average={stats_type}')
+@instrument
+def _stats_api_call(package_str: str, stats_type: str = "daily", start_date: datetime = None):
+    return fetch.get_json(_stats_url(package_str=package_str, stats_type=stats_type, start_date=start_date))
 
 
+@instrument
 def _version_stats_api_call(package_str: str, version: str, stats_type: str = "daily"):
-    return objectrest.get_json(
-        f'https://packagist.org/packages/{package_str}/stats/{version}.json?average={stats_type}')
+    return fetch.get_json(_version_stats_url(package_str=package_str, version=version, stats_type=stats_type))
+
 
+class PHPPackageDownloadStat(DatedStat):
+    __slots__ = ('downloads',)
 
-class PHPPackageDownloadStat:
     def __init__(self, date: str, downloads: int):
-        self.date = date
+        super().__init__(date)
         self.downloads = downloads
 
 
-def _process_stats(data: dict, value_key: str = None) -> list[PHPPackageDownloadStat]:
-    stats = []
+def _process_stats(data: dict, value_key: str = None) -> DownloadSeries:
     labels = data.get('labels')
     values = data.get('values')
     if value_key:
         values = values.get(value_key)
-    for i in range(0, len(labels)):
-        stats.append(PHPPackageDownloadStat(date=labels[i], downloads=values[i]))
-    return stats
+    return DownloadSeries.from_pairs(zip(labels, values), stat_type=PHPPackageDownloadStat)
 
 
 class PHPPackageVersion:
-    def __init__(self, version_name: str, data: dict):
+    __slots__ = ('version_name', '_data', '_package_name')
+
+    def __init__(self, version_name: str, data: dict = None, package_name: str = None):
         self.version_name = version_name
-        self.data = data
-        self._package_name = data.get('name')
+        self._data = data
+        self._package_name = package_name or data.get('name')
+
+    @property
+    def data(self) -> dict:
+        # looked up in the package document on first access instead of being held by every version
+        if self._data is None:
+            self._data = _info_api_call(package_str=self._package_name).get('versions').get(self.version_name, {})
+        return self._data
 
     @property
-    def daily_downloads(self) -> list[PHPPackageDownloadStat]:
+    def daily_downloads(self) -> DownloadSeries:
         data = _version_stats_api_call(package_str=self._package_name, version=self.version_name, stats_type="daily")
         return _process_stats(data=data, value_key=self.version_name)
 
     @property
-    def average_daily_downloads_weekly(self) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_weekly(self) -> DownloadSeries:
         data = _version_stats_api_call(package_str=self._package_name, version=self.version_name, stats_type="weekly")
         return _process_stats(data=data, value_key=self.version_name)
 
     @property
-    def average_daily_downloads_monthly(self) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_monthly(self) -> DownloadSeries:
         data = _version_stats_api_call(package_str=self._package_name, version=self.version_name, stats_type="monthly")
         return _process_stats(data=data, value_key=self.version_name)
 
 
+def _process_versions(data: dict) -> list[PHPPackageVersion]:
+    versions = []
+    package_name = data.get('name')
+    for name in data.get('versions'):
+        versions.append(PHPPackageVersion(version_name=name, package_name=package_name))
+    return versions
+
+
 class PHPPackage:
-    def __init__(self, package_author: str, package_name: str):
+    def __init__(self, package_author: str, package_name: str, history: HistoryStore = None):
         self.package_author = package_author
         self.package_name = package_name
+        self.history = history
 
     @property
     def _package_str(self) -> str:
@@ -74,27 +115,49 @@ class PHPPackage:
 
     @property
     def versions(self) -> list[PHPPackageVersion]:
-        data = _info_api_call(package_str=self._package_str).get('versions')
-        versions = []
-        for name, version_data in data.items():
-            versions.append(PHPPackageVersion(version_name=name, data=version_data))
-        return versions
+        return _process_versions(data=_info_api_call(package_str=self._package_str))
 
     @property
     def latest_version(self) -> PHPPackageVersion:
-        return self.versions[0]
+        data = _info_api_call(package_str=self._package_str)
+        return PHPPackageVersion(version_name=next(iter(data.get('versions'))), package_name=data.get('name'))
+
+    def version_stats(self, intervals: tuple = INTERVALS, versions: list[str] = None,
+                      max_workers: int = 8) -> dict[str, dict[str, DownloadSeries]]:
+        # version -> interval -> series, fetched concurrently from one read of the package document
+        if versions is None:
+            versions = list(_info_api_call(package_str=self._package_str).get('versions'))
+        tasks = [(version, interval) for version in versions for interval in intervals]
+        stats = {version: {} for version in versions}
+        if not tasks:
+            return stats
+        fetch_stats = bind_caller(lambda task: self._daily_stats_by_version(version=task[0], interval=task[1]))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            for (version, interval), series in zip(tasks, executor.map(fetch_stats, tasks)):
+                stats[version][interval] = series
+        return stats
 
     # General stats
     @property
-    def daily_downloads(self) -> list[PHPPackageDownloadStat]:
+    def daily_downloads(self) -> DownloadSeries:
+        if self.history:
+            return self._stored_daily_stats()
         return self._daily_stats(interval="daily")
 
+    def _stored_daily_stats(self) -> DownloadSeries:
+        start_date = self.history.refresh_start(PACKAGIST, self._package_str)
+        data = _stats_api_call(package_str=self._package_str, stats_type="daily", start_date=start_date)
+        stats = _process_stats(data=data, value_key=self._package_str)
+        self.history.merge(PACKAGIST, self._package_str, [(stat.date, stat.downloads) for stat in stats])
+        rows = self.history.load(PACKAGIST, self._package_str)
+        return DownloadSeries.from_pairs(rows, stat_type=PHPPackageDownloadStat)
+
     @property
-    def average_daily_downloads_weekly(self) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_weekly(self) -> DownloadSeries:
         return self._daily_stats(interval="weekly")
 
     @property
-    def average_daily_downloads_monthly(self) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_monthly(self) -> DownloadSeries:
         return self._daily_stats(interval="monthly")
 
     @property
@@ -113,11 +176,11 @@ class PHPPackage:
             'total')
 
     # Specific version stats
-    def daily_downloads_by_version(self, version: str) -> list[PHPPackageDownloadStat]:
+    def daily_downloads_by_version(self, version: str) -> DownloadSeries:
         return self._daily_stats_by_version(version=version, interval="daily")
 
-    def average_daily_downloads_weekly_by_version(self, version: str) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_weekly_by_version(self, version: str) -> DownloadSeries:
         return self._daily_stats_by_version(version=version, interval="weekly")
 
-    def average_daily_downloads_monthly_by_version(self, version: str) -> list[PHPPackageDownloadStat]:
+    def average_daily_downloads_monthly_by_version(self, version: str) -> DownloadSeries:
         return self._daily_stats_by_version(version=version, interval="monthly")
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import aiohttp
+
+import PHP
+import csharp
+import fetch
+import metrics
+import node
+import python
+import ruby
+from series import CategoryBreakdown, DownloadSeries
+from transport import RETRY_STATUSES, Transport
+
+
+def _encode_params(params: dict = None) -> dict:
+    if not params:
+        return params
+    # aiohttp refuses non-string query values; match how requests renders them
+    return {key: str(value) for key, value in params.items()}
+
+
+# The async clients mirror the sync classes method for method but share no base class with them, so nothing
+# blocking or sync-only (history stores, compact streaming) is reachable from an async client by accident.
+
+
+class AsyncSession:
+    # Requests take their per-host token buckets, retry policy, timeout and headers from a Transport, by default
+    # the one the sync clients use, so sync and async callers together stay within each host's budget.
+    # Requests are counted in metrics.registry under aio.AsyncSession.get_json.
+    def __init__(self, concurrency: int = 20, session: aiohttp.ClientSession = None, use_cache: bool = True,
+                 transport: Transport = None):
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        self.transport = transport
+        self._own_transport = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = session
+        self._owns_session = session is None
+        self._in_flight = {}
+
+    async def __aenter__(self) -> 'AsyncSession':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self):
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    def _transport(self) -> Transport:
+        if self.transport is not None:
+            return self.transport
+        if isinstance(fetch.transport, Transport):
+            return fetch.transport
+        # a stand-in set through fetch.set_transport has no rate limits or retries to share
+        if self._own_transport is None:
+            self._own_transport = Transport()
+        return self._own_transport
+
+    @metrics.instrument
+    async def get_json(self, url: str, params: dict = None, headers: dict = None):
+        key = fetch._key(url, params, headers)
+        if self.use_cache:
+            data = fetch.response_cache.get(key)
+            if data is not None:
+                metrics.observe_cache_hit()
+                return data
+        # concurrent coroutines asking for the same URL await one shared request
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(self._request(key, url, params, headers))
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.observe_coalesced()
+        return await asyncio.shield(task)
+
+    async def _request(self, key: str, url: str, params: dict = None, headers: dict = None):
+        async with self._semaphore:
+            data = await self._get(url, params=params, headers=headers)
+        if self.use_cache and data is not None:
+            fetch.response_cache.set(key, data)
+        return data
+
+    async def _get(self, url: str, params: dict = None, headers: dict = None):
+        # the async counterpart of Transport.get followed by Transport.get_json
+        transport = self._transport()
+        url = transport.resolve(url)
+        bucket = transport.bucket(url)
+        timeout = aiohttp.ClientTimeout(total=transport.timeout)
+        attempt = 0
+        while True:
+            await asyncio.sleep(bucket.reserve())
+            started = time.perf_counter()
+            try:
+                async with self._client().get(url, params=_encode_params(params),
+                                              headers={**transport.headers, **(headers or {})},
+                                              timeout=timeout) as response:
+                    if response.status not in RETRY_STATUSES or attempt >= transport.max_retries:
+                        response.raise_for_status()
+                        body = await response.read()
+                        received = time.perf_counter()
+                        data = json.loads(body) if body else None
+                        metrics.observe_response(request_seconds=received - started, response_bytes=len(body),
+                                                 parse_seconds=time.perf_counter() - received)
+                        return data
+                    delay = transport.retry_delay(attempt, bucket, response)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= transport.max_retries:
+                    raise
+                delay = transport.retry_delay(attempt, bucket)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncPythonPackage:
+    def __init__(self, package_name: str, session: AsyncSession):
+        self.package_name = package_name
+        self._session = session
+        # last overall payload seen and the series indexed from it
+        self._overall = (None, None)
+
+    async def _pepy_info(self) -> dict:
+        return await self._session.get_json(python._pepy_info_url(package_name=self.package_name))
+
+    async def _pypi_stats(self, endpoint: str, params: dict = None):
+        url = python._pypi_stats_url(package_name=self.package_name, endpoint=endpoint)
+        return (await self._session.get_json(url, params=params)).get('data')
+
+    async def downloads_lifetime(self) -> int:
+        return (await self._pepy_info()).get('total_downloads', 0)
+
+    async def snapshot(self) -> python.PythonPackageSnapshot:
+        return python.PythonPackageSnapshot(package_name=self.package_name, data=await self._pepy_info())
+
+    async def versions(self) -> list[python.PythonPackageVersion]:
+        return (await self.snapshot()).versions
+
+    async def _overall_series(self) -> DownloadSeries:
+        data = await self._pypi_stats('overall', params={'mirrors': False})
+        indexed_data, series = self._overall
+        if indexed_data is not data:
+            series = python._process_overall_stats(data=data)
+            self._overall = (data, series)
+        return series
+
+    async def downloads_on(self, date: datetime) -> int:
+        return (await self._overall_series()).on(date)
+
+    async def downloads_between(self, start_date: datetime, end_date: datetime) -> DownloadSeries:
+        return (await self._overall_series()).between(start_date, end_date)
+
+    async def downloads_since(self, date: datetime) -> DownloadSeries:
+        return (await self._overall_series()).since(date)
+
+    async def downloads_yesterday(self) -> int:
+        return (await self._pypi_stats('recent')).get('last_day', 0)
+
+    async def downloads_last_week(self) -> int:
+        return (await self._pypi_stats('recent')).get('last_week', 0)
+
+    async def downloads_last_month(self) -> int:
+        return (await self._pypi_stats('recent')).get('last_month', 0)
+
+    async def daily_downloads_totals(self) -> DownloadSeries:
+        return (await self.snapshot()).daily_downloads_totals
+
+    async def daily_downloads_for_version(self, version_name: str) -> DownloadSeries:
+        return (await self.snapshot()).daily_downloads_for_version(version_name=version_name)
+
+    async def recent_total_downloads_for_version(self, version_name: str) -> int:
+        return (await self.snapshot()).recent_total_downloads_for_version(version_name=version_name)
+
+    async def recent_total_downloads_by_operating_system(self, operating_system: str) -> int:
+        data = await self._pypi_stats('system', params={'os': operating_system})
+        return python._sum_stat_rows(data=data)
+
+    async def recent_total_downloads_by_python_version(self, python_version: str) -> int:
+        data = await self._pypi_stats('python_minor', params={'version': python_version})
+        return python._sum_stat_rows(data=data)
+
+    async def operating_system_breakdown(self) -> CategoryBreakdown:
+        return python._process_breakdown(data=await self._pypi_stats('system'))
+
+    async def python_major_breakdown(self) -> CategoryBreakdown:
+        return python._process_breakdown(data=await self._pypi_stats('python_major'))
+
+    async def python_minor_breakdown(self) -> CategoryBreakdown:
+        return python._process_breakdown(data=await self._pypi_stats('python_minor'))
+
+
+class AsyncPHPPackageVersion:
+    # PHP.PHPPackageVersion fetches its stats through blocking properties, so the async client has its own
+    __slots__ = ('version_name', 'data', '_package_name', '_session')
+
+    def __init__(self, version_name: str, data: dict, package_name: str, session: AsyncSession):
+        self.version_name = version_name
+        self.data = data
+        self._package_name = package_name
+        self._session = session
+
+    async def _stats(self, interval: str) -> DownloadSeries:
+        url = PHP._version_stats_url(package_str=self._package_name, version=self.version_name, stats_type=interval)
+        return PHP._process_stats(data=await self._session.get_json(url), value_key=self.version_name)
+
+    async def daily_downloads(self) -> DownloadSeries:
+        return await self._stats(interval="daily")
+
+    async def average_daily_downloads_weekly(self) -> DownloadSeries:
+        return await self._stats(interval="weekly")
+
+    async def average_daily_downloads_monthly(self) -> DownloadSeries:
+        return await self._stats(interval="monthly")
+
+
+class AsyncPHPPackage:
+    def __init__(self, package_author: str, package_name: str, session: AsyncSession):
+        self.package_author = package_author
+        self.package_name = package_name
+        self._session = session
+
+    @property
+    def _package_str(self) -> str:
+        return f"{self.package_author}/{self.package_name}"
+
+    async def _info(self) -> dict:
+        return (await self._session.get_json(PHP._info_url(package_str=self._package_str))).get('package')
+
+    async def _daily_stats(self, interval: str = "daily") -> DownloadSeries:
+        data = await self._session.get_json(PHP._stats_url(package_str=self._package_str, stats_type=interval))
+        return PHP._process_stats(data=data, value_key=self._package_str)
+
+    async def _daily_stats_by_version(self, version: str, interval: str = "daily") -> DownloadSeries:
+        url = PHP._version_stats_url(package_str=self._package_str, version=version, stats_type=interval)
+        return PHP._process_stats(data=await self._session.get_json(url), value_key=version)
+
+    async def versions(self) -> list[AsyncPHPPackageVersion]:
+        data = await self._info()
+        return [AsyncPHPPackageVersion(version_name=name, data=version_data, package_name=data.get('name'),
+                                       session=self._session)
+                for name, version_data in data.get('versions').items()]
+
+    async def latest_version(self) -> AsyncPHPPackageVersion:
+        return (await self.versions())[0]
+
+    async def daily_downloads(self) -> DownloadSeries:
+        return await self._daily_stats(interval="daily")
+
+    async def average_daily_downloads_weekly(self) -> DownloadSeries:
+        return await self._daily_stats(interval="weekly")
+
+    async def average_daily_downloads_monthly(self) -> DownloadSeries:
+        return await self._daily_stats(interval="monthly")
+
+    async def average_daily_downloads_lifetime(self) -> int:
+        return (await self._info()).get('downloads').get('daily')
+
+    async def average_monthly_downloads_lifetime(self) -> int:
+        return (await self._info()).get('downloads').get('monthly')
+
+    async def total_downloads_lifetime(self) -> int:
+        return (await self._info()).get('downloads').get('total')
+
+    async def daily_downloads_by_version(self, version: str) -> DownloadSeries:
+        return await self._daily_stats_by_version(version=version, interval="daily")
+
+    async def average_daily_downloads_weekly_by_version(self, version: str) -> DownloadSeries:
+        return await self._daily_stats_by_version(version=version, interval="weekly")
+
+    async def average_daily_downloads_monthly_by_version(self, version: str) -> DownloadSeries:
+        return await self._daily_stats_by_version(version=version, interval="monthly")
+
+    async def version_stats(self, intervals: tuple = PHP.INTERVALS, versions: list[str] = None,
+                            max_concurrency: int = 8) -> dict[str, dict[str, DownloadSeries]]:
+        # version -> interval -> series, at most max_concurrency requests at a time from this call
+        if versions is None:
+            versions = list((await self._info()).get('versions'))
+        tasks = [(version, interval) for version in versions for interval in intervals]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def fetch_stats(version: str, interval: str) -> DownloadSeries:
+            async with semaphore:
+                return await self._daily_stats_by_version(version=version, interval=interval)
+
+        results = await asyncio.gather(*(fetch_stats(version, interval) for version, interval in tasks))
+        stats = {version: {} for version in versions}
+        for (version, interval), series in zip(tasks, results):
+            stats[version][interval] = series
+        return stats
+
+
+class AsyncNodePackage:
+    def __init__(self, author_name: str, package_name: str, session: AsyncSession):
+        self.author_name = author_name
+        self.package_name = package_name
+        self._session = session
+
+    @property
+    def package_str(self) -> str:
+        return node._package_str(self.author_name, self.package_name)
+
+    async def versions(self) -> list[node.NodePackageVersion]:
+        return node._process_versions(await self._session.get_json(node._info_url(self.package_str)))
+
+    async def version_names(self) -> list[str]:
+        data = await self._session.get_json(node._info_url(self.package_str), headers=node.ABBREVIATED_METADATA)
+        return list(data.get('versions', {}))
+
+    async def latest_version(self) -> node.NodePackageVersion:
+        versions = await self.versions()
+        return versions[-1] if versions else None
+
+    async def downloads_between(self, start_date: datetime, end_date: datetime) -> DownloadSeries:
+        # same chunking as the sync client, so multi-year ranges stay within npm's range limit
+        results = await asyncio.gather(*(self._session.get_json(node._stats_url(self.package_str, start, end))
+                                         for start, end in node._date_chunks(start_date, end_date)))
+        return node._process_download_stats([row for data in results for row in data.get('downloads') or []])
+
+    async def downloads_since(self, date: datetime) -> DownloadSeries:
+        return await self.downloads_between(date, datetime.now())
+
+    async def downloads_on(self, date: datetime) -> node.NodePackageDownloadStat:
+        stats = await self.downloads_between(date, date)
+        return stats[0] if stats else None
+
+    async def downloads_today(self) -> int:
+        stats = await self.downloads_on(datetime.now())
+        return stats.downloads if stats else 0
+
+    async def downloads_yesterday(self) -> int:
+        stats = await self.downloads_on(datetime.now() - timedelta(days=1))
+        return stats.downloads if stats else 0
+
+    async def downloads_last_week(self) -> int:
+        return node._sum_downloads(await self.downloads_since(datetime.now() - timedelta(days=7)))
+
+    async def downloads_last_month(self) -> int:
+        return node._sum_downloads(await self.downloads_since(datetime.now() - timedelta(days=30)))
+
+    async def downloads_last_year(self) -> int:
+        return node._sum_downloads(await self.downloads_since(datetime.now() - timedelta(days=365)))
+
+
+class AsyncNugetPackage:
+    def __init__(self, package_name: str, session: AsyncSession):
+        self.package_name = package_name
+        self._session = session
+
+    async def _stats_table(self, params: str) -> list:
+        return (await self._session.get_json(csharp._stats_url(self.package_name, params))).get('Table')
+
+    async def versions(self) -> list[csharp.NugetPackageVersion]:
+        data = await self._session.get_json(csharp._info_url(self.package_name))
+        return csharp._process_versions(package_name=self.package_name, data=data)
+
+    async def latest_version(self) -> csharp.NugetPackageVersion:
+        return (await self.versions())[-1]
+
+    async def detailed_versions(self) -> list[csharp.NugetPackageVersion]:
+        version_data, client_version_data = await asyncio.gather(
+            self._stats_table(csharp.VERSION_PARAMS), self._stats_table(csharp.VERSION_CLIENT_PARAMS))
+        return csharp._process_detailed_versions(package_name=self.package_name, version_data=version_data,
+                                                 client_version_data=client_version_data)
+
+    async def clients(self) -> list[csharp.NugetPackageClient]:
+        data = await self._stats_table(csharp.CLIENT_PARAMS)
+        return csharp._process_clients(package_name=self.package_name, data=data)
+
+    async def recent_total_downloads(self) -> int:
+        return csharp._sum_version_downloads(await self._stats_table(csharp.VERSION_PARAMS))
+
+    async def recent_total_downloads_by_version(self, version: str) -> int:
+        for v in await self.versions():
+            if v.version == version:
+                return v.total_downloads
+        return 0
+
+    async def recent_total_downloads_by_client(self, client: str) -> int:
+        for c in await self.clients():
+            if c.client_version == client:
+                return c.total_downloads
+        return 0
+
+
+class AsyncRubyGem:
+    def __init__(self, gem_name: str, session: AsyncSession):
+        self.gem_name = gem_name
+        self._session = session
+
+    async def _api_call(self, endpoint: str):
+        return await self._session.get_json(ruby._api_url(gem_name=self.gem_name, endpoint=endpoint))
+
+    async def daily_downloads(self) -> DownloadSeries:
+        return ruby._process_download_stats(await self._api_call("daily_downloads"))
+
+    async def total_downloads(self) -> DownloadSeries:
+        return ruby._process_download_stats(await self._api_call("total_downloads"))
+
+    async def daily_ranking(self) -> DownloadSeries:
+        return ruby._process_ranking_stats(await self._api_call("daily_ranking"))
+
+    async def total_ranking(self) -> DownloadSeries:
+        return ruby._process_ranking_stats(await self._api_call("total_ranking"))
+
+    async def snapshot(self, rankings: bool = True, fetch_daily_downloads: bool = False) -> ruby.RubyGemSnapshot:
+        endpoints = ['total_downloads']
+        if rankings:
+            endpoints += ['daily_ranking', 'total_ranking']
+        if fetch_daily_downloads:
+            endpoints.append('daily_downloads')
+        results = await asyncio.gather(*(self._api_call(endpoint) for endpoint in endpoints))
+        return ruby._build_snapshot(self.gem_name, dict(zip(endpoints, results)))
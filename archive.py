@@ -0,0 +1,271 @@
+import importlib
+import json
+import os
+import struct
+from typing import Iterable, Union
+
+import numpy as np
+
+from csharp import NugetPackageClient, NugetPackageVersion
+from series import DownloadSeries
+
+# File layout: MAGIC, a little-endian uint64 header length, a JSON header, then 8-byte aligned raw sections.
+# The header only names sections (dtype, offset, length); every per-series and per-row value lives in a
+# section, so opening an archive maps the file and reads a few hundred bytes no matter how many series it holds.
+MAGIC = b'PKSTATS\x01'
+_ALIGN = 8
+_LENGTH = struct.Struct('<Q')
+
+
+def series_key(ecosystem: str, package: str, name: str) -> str:
+    return f'{ecosystem}/{package}/{name}'
+
+
+def _stat_type_name(stat_type: type) -> str:
+    return f'{stat_type.__module__}.{stat_type.__qualname__}' if stat_type else ''
+
+
+def _resolve_stat_type(name: str):
+    if not name:
+        return None
+    module, _, attribute = name.rpartition('.')
+    return getattr(importlib.import_module(module), attribute)
+
+
+class _SectionWriter:
+    def __init__(self):
+        self.sections = {}
+        self.arrays = []
+        self.size = 0
+
+    def add(self, name: str, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        self.size += -self.size % _ALIGN
+        self.sections[name] = {'dtype': array.dtype.str, 'offset': self.size, 'length': len(array)}
+        self.arrays.append((self.size, array))
+        self.size += array.nbytes
+
+    def add_strings(self, name: str, values: Iterable[str]):
+        encoded = [value.encode() for value in values]
+        self.add(f'{name}.offsets', np.concatenate(([0], np.cumsum([len(value) for value in encoded],
+                                                                     dtype=np.int64))).astype(np.int64))
+        self.add(f'{name}.data', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+def write_archive(path: str, series: dict[str, DownloadSeries] = None, tables: dict[str, dict[str, list]] = None):
+    series = series or {}
+    tables = tables or {}
+    writer = _SectionWriter()
+
+    # series sorted by key so readers can binary-search the key column
+    keys = sorted(series)
+    kinds = []
+    kind_index = {}
+    kind_codes = []
+    for key in keys:
+        kind = (_stat_type_name(series[key].stat_type), series[key].value_name)
+        if kind not in kind_index:
+            kind_index[kind] = len(kinds)
+            kinds.append(kind)
+        kind_codes.append(kind_index[kind])
+    lengths = [len(series[key]) for key in keys]
+    writer.add_strings('series.keys', keys)
+    writer.add('series.bounds', np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64))
+    writer.add('series.kinds', np.asarray(kind_codes, dtype=np.int32))
+    writer.add('series.dates', np.concatenate([series[key].dates.astype(np.int64) for key in keys]
+                                              or [np.zeros(0, dtype=np.int64)]))
+    writer.add('series.counts', np.concatenate([series[key].counts for key in keys]
+                                               or [np.zeros(0, dtype=np.int64)]))
+
+    table_columns = {}
+    for table_name, columns in tables.items():
+        table_columns[table_name] = {}
+        for column, values in columns.items():
+            section = f'table.{table_name}.{column}'
+            if values and isinstance(values[0], str):
+                writer.add_strings(section, values)
+                table_columns[table_name][column] = 'str'
+            else:
+                writer.add(section, np.asarray(values, dtype=np.int64))
+                table_columns[table_name][column] = 'int'
+
+    header = json.dumps({'sections': writer.sections, 'kinds': kinds, 'tables': table_columns}).encode()
+    data_start = len(MAGIC) + _LENGTH.size + len(header)
+    data_start += -data_start % _ALIGN
+
+    # written beside the target and renamed, so readers that have the old file mapped keep a consistent view
+    temporary_path = f'{path}.tmp{os.getpid()}'
+    with open(temporary_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_LENGTH.pack(data_start - len(MAGIC) - _LENGTH.size))
+        file.write(header.ljust(data_start - len(MAGIC) - _LENGTH.size, b' '))
+        for offset, array in writer.arrays:
+            file.seek(data_start + offset)
+            file.write(array.tobytes())
+        file.truncate(data_start + writer.size)
+    os.replace(temporary_path, path)
+
+
+class StringColumn:
+    # Strings decoded from the mapped bytes on access.
+    __slots__ = ('offsets', 'data')
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode()
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class SeriesArchive:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a package stats archive')
+            header_length = _LENGTH.unpack(file.read(_LENGTH.size))[0]
+            header = json.loads(file.read(header_length))
+        self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        self._data_start = len(MAGIC) + _LENGTH.size + header_length
+        self._sections = header['sections']
+        self._kinds = [(_resolve_stat_type(stat_type), value_name) for stat_type, value_name in header['kinds']]
+        self._tables = header['tables']
+        self._keys = self._strings('series.keys')
+        self._bounds = self._array('series.bounds')
+        self._kind_codes = self._array('series.kinds')
+        self._dates = self._array('series.dates').view('datetime64[D]')
+        self._counts = self._array('series.counts')
+
+    def _array(self, name: str) -> np.ndarray:
+        # a view straight into the mapped file; nothing is copied
+        section = self._sections[name]
+        dtype = np.dtype(section['dtype'])
+        start = self._data_start + section['offset']
+        return self._buffer[start:start + section['length'] * dtype.itemsize].view(dtype)
+
+    def _strings(self, name: str) -> StringColumn:
+        return StringColumn(self._array(f'{name}.offsets'), self._array(f'{name}.data'))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def __enter__(self) -> 'SeriesArchive':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _find(self, key: str):
+        low, high = 0, len(self._keys)
+        while low < high:
+            middle = (low + high) // 2
+            if self._keys[middle] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._keys) and self._keys[low] == key:
+            return low
+        return None
+
+    def get(self, key: str) -> Union[DownloadSeries, None]:
+        index = self._find(key)
+        if index is None:
+            return None
+        start, end = int(self._bounds[index]), int(self._bounds[index + 1])
+        stat_type, value_name = self._kinds[int(self._kind_codes[index])]
+        return DownloadSeries(self._dates[start:end], self._counts[start:end], stat_type=stat_type,
+                              value_name=value_name)
+
+    def __getitem__(self, key: str) -> DownloadSeries:
+        series = self.get(key)
+        if series is None:
+            raise KeyError(key)
+        return series
+
+    @property
+    def tables(self) -> list[str]:
+        return list(self._tables)
+
+    def table(self, name: str) -> dict[str, Union[np.ndarray, StringColumn]]:
+        columns = self._tables[name]
+        return {column: self._strings(f'table.{name}.{column}') if kind == 'str'
+                else self._array(f'table.{name}.{column}')
+                for column, kind in columns.items()}
+
+    def close(self):
+        mapping = getattr(self._buffer, '_mmap', None)
+        self._buffer = None
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # series handed out still point into the mapping; it closes when they are released
+                pass
+
+
+def nuget_versions_table(versions: list[NugetPackageVersion]) -> dict[str, list]:
+    return {
+        'package_name': [version._package_name for version in versions],
+        'version': [version.version for version in versions],
+        'total_downloads': [version.total_downloads for version in versions],
+    }
+
+
+def nuget_version_clients_table(versions: list[NugetPackageVersion]) -> dict[str, list]:
+    rows = [(version._package_name, version.version, client_version, downloads)
+            for version in versions for client_version, downloads in version.client_data.items()]
+    return {
+        'package_name': [row[0] for row in rows],
+        'version': [row[1] for row in rows],
+        'client_version': [row[2] for row in rows],
+        'total_downloads': [row[3] for row in rows],
+    }
+
+
+def nuget_clients_table(clients: list[NugetPackageClient]) -> dict[str, list]:
+    return {
+        'package_name': [client._package_name for client in clients],
+        'client_version': [client.client_version for client in clients],
+        'total_downloads': [client.total_downloads for client in clients],
+    }
+
+
+def nuget_versions(archive: SeriesArchive, versions_table: str, version_clients_table: str = None) \
+        -> list[NugetPackageVersion]:
+    table = archive.table(versions_table)
+    versions = [NugetPackageVersion(package_name, version, int(total_downloads))
+                for package_name, version, total_downloads in zip(table['package_name'], table['version'],
+                                                                  table['total_downloads'].tolist())]
+    if version_clients_table:
+        by_version = {(version._package_name, version.version): version for version in versions}
+        clients = archive.table(version_clients_table)
+        for package_name, version, client_version, downloads in zip(clients['package_name'], clients['version'],
+                                                                    clients['client_version'],
+                                                                    clients['total_downloads'].tolist()):
+            entry = by_version.get((package_name, version))
+            if entry is not None:
+                entry.client_data[client_version] = downloads
+    return versions
+
+
+def nuget_clients(archive: SeriesArchive, clients_table: str) -> list[NugetPackageClient]:
+    table = archive.table(clients_table)
+    return [NugetPackageClient(package_name, client_version, int(total_downloads))
+            for package_name, client_version, total_downloads in zip(table['package_name'], table['client_version'],
+                                                                     table['total_downloads'].tolist())]
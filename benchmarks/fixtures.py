@@ -0,0 +1,181 @@
+import random
+import re
+import zlib
+from datetime import date, timedelta
+from typing import Optional
+from urllib.parse import parse_qs, unquote
+
+
+class FixtureSizes:
+    def __init__(self, versions: int = 1000, days: int = 3650, pepy_days: int = 90, active_versions: int = 50,
+                 clients: int = 20, seed: int = 0):
+        self.versions = versions
+        self.days = days
+        self.pepy_days = pepy_days
+        # only this many recent versions see downloads on any given day, as in real pepy/packagist data
+        self.active_versions = active_versions
+        self.clients = clients
+        self.seed = seed
+
+
+def _days(count: int, end: date = None) -> list[date]:
+    end = end or date.today()
+    return [end - timedelta(days=offset) for offset in range(count - 1, -1, -1)]
+
+
+def _version_names(count: int) -> list[str]:
+    return [f"{i // 100}.{i // 10 % 10}.{i % 10}" for i in range(count)]
+
+
+class SyntheticFixtures:
+    def __init__(self, sizes: FixtureSizes = None):
+        self.sizes = sizes or FixtureSizes()
+        self._routes = [
+            ('api.pepy.tech', re.compile(r'^/api/v2/projects/(?P<package>[^/]+)$'), self._pepy),
+            ('pypistats.org', re.compile(r'^/api/packages/(?P<package>[^/]+)/(?P<endpoint>\w+)$'), self._pypistats),
+            ('packagist.org', re.compile(r'^/packages/(?P<package>[^/]+/[^/]+)\.json$'), self._packagist_info),
+            ('packagist.org', re.compile(r'^/packages/(?P<package>[^/]+/[^/]+)/stats/(?P<version>.+)\.json$'),
+             self._packagist_stats),
+            ('api.npmjs.org', re.compile(r'^/downloads/range/(?P<start>[\d-]+):(?P<end>[\d-]+)/(?P<packages>.+)$'),
+             self._npm_range),
+            ('registry.npmjs.org', re.compile(r'^/(?P<package>(@[^/]+/)?[^/@]+)/(?P<version>[^/]+)$'),
+             self._npm_version),
+            ('registry.npmjs.org', re.compile(r'^/(?P<package>.+)$'), self._npm_registry),
+            ('azuresearch-usnc.nuget.org', re.compile(r'^/query$'), self._nuget_search),
+            ('www.nuget.org', re.compile(r'^/stats/reports/packages/(?P<package>[^/]+)$'), self._nuget_report),
+            ('bestgems.org', re.compile(r'^/api/v1/gems/(?P<gem>[^/]+)/(?P<endpoint>\w+)\.json$'), self._bestgems),
+        ]
+
+    def payload(self, host: str, path: str, query: str = '') -> Optional[object]:
+        params = parse_qs(query)
+        for route_host, pattern, handler in self._routes:
+            if route_host != host:
+                continue
+            match = pattern.match(unquote(path))
+            if match:
+                return handler(params=params, **match.groupdict())
+        return None
+
+    def _random(self, *key) -> random.Random:
+        return random.Random(zlib.crc32(repr((self.sizes.seed,) + key).encode()))
+
+    def _pepy(self, params: dict, package: str) -> dict:
+        rng = self._random('pepy', package)
+        versions = _version_names(self.sizes.versions)
+        active = versions[-self.sizes.active_versions:]
+        downloads = {}
+        total = 0
+        for day in _days(self.sizes.pepy_days):
+            counts = {version: rng.randint(0, 500) for version in active}
+            total += sum(counts.values())
+            downloads[day.isoformat()] = counts
+        return {'id': package, 'total_downloads': total * 10, 'versions': versions, 'downloads': downloads}
+
+    def _pypistats(self, params: dict, package: str, endpoint: str) -> dict:
+        rng = self._random('pypistats', package, endpoint)
+        if endpoint == 'recent':
+            return {'package': package, 'type': 'recent_downloads',
+                    'data': {'last_day': rng.randint(0, 10 ** 4), 'last_week': rng.randint(0, 10 ** 5),
+                             'last_month': rng.randint(0, 10 ** 6)}}
+        categories = {
+            'overall': ['with_mirrors', 'without_mirrors'],
+            'python_major': ['2', '3', 'null'],
+            'python_minor': ['2.7', '3.7', '3.8', '3.9', '3.10', '3.11', '3.12', 'null'],
+            'system': ['Darwin', 'Linux', 'Windows', 'other', 'null'],
+        }.get(endpoint, [])
+        wanted = (params.get('os') or params.get('version') or [None])[0]
+        if endpoint == 'overall' and params.get('mirrors', ['true'])[0].lower() == 'false':
+            wanted = 'without_mirrors'
+        rows = []
+        for day in _days(min(self.sizes.days, 180)):
+            for category in categories:
+                if wanted is None or category == wanted:
+                    rows.append({'category': category, 'date': day.isoformat(), 'downloads': rng.randint(0, 5000)})
+        return {'package': package, 'type': f'{endpoint}_downloads', 'data': rows}
+
+    def _packagist_info(self, params: dict, package: str) -> dict:
+        versions = {}
+        for version in reversed(_version_names(self.sizes.versions)):
+            versions[version] = {'name': package, 'version': version, 'description': 'synthetic fixture',
+                                 'require': {'php': '>=7.4'}, 'time': '2020-01-01T00:00:00+00:00'}
+        return {'package': {'name': package, 'versions': versions,
+                            'downloads': {'total': 10 ** 7, 'monthly': 10 ** 5, 'daily': 3000}}}
+
+    def _packagist_stats(self, params: dict, package: str, version: str) -> dict:
+        rng = self._random('packagist', package, version)
+        average = params.get('average', ['daily'])[0]
+        days = _days(self.sizes.days)
+        start = params.get('from', [None])[0]
+        if start:
+            days = [day for day in days if day.isoformat() >= start]
+        if average == 'monthly':
+            labels = sorted({day.strftime('%Y-%m') for day in days})
+        elif average == 'weekly':
+            labels = [day.isoformat() for day in days if day.weekday() == 0]
+        else:
+            labels = [day.isoformat() for day in days]
+        key = package if version == 'all' else version
+        return {'labels': labels, 'values': {key: [rng.randint(0, 5000) for _ in labels]}, 'average': average}
+
+    def _npm_range(self, params: dict, start: str, end: str, packages: str) -> dict:
+        days = [day for day in _days(self.sizes.days) if start <= day.isoformat() <= end]
+
+        def document(package: str) -> dict:
+            rng = self._random('npm', package, start)
+            return {'start': start, 'end': end, 'package': package,
+                    'downloads': [{'day': day.isoformat(), 'downloads': rng.randint(0, 10 ** 4)} for day in days]}
+
+        names = packages.split(',')
+        if len(names) == 1:
+            return document(names[0])
+        return {name: document(name) for name in names}
+
+    def _npm_version(self, params: dict, package: str, version: str) -> dict:
+        return {'name': package, 'version': version, 'description': 'synthetic fixture',
+                'dependencies': {f'dep-{j}': '^1.0.0' for j in range(10)}}
+
+    def _npm_registry(self, params: dict, package: str) -> dict:
+        versions = {}
+        times = {'created': '2015-01-01T00:00:00.000Z'}
+        for i, version in enumerate(_version_names(self.sizes.versions)):
+            versions[version] = {'name': package, 'version': version, 'description': 'synthetic fixture',
+                                 'dependencies': {f'dep-{j}': '^1.0.0' for j in range(10)},
+                                 'dist': {'tarball': f'https://registry.npmjs.org/{package}/-/{version}.tgz',
+                                          'shasum': '0' * 40}}
+            times[version] = (date(2015, 1, 1) + timedelta(days=i)).isoformat() + 'T00:00:00.000Z'
+        return {'name': package, 'dist-tags': {'latest': version}, 'versions': versions, 'time': times}
+
+    def _nuget_search(self, params: dict) -> dict:
+        package = params.get('q', [''])[0]
+        versions = [{'version': version, 'downloads': 1000 + i} for i, version in
+                    enumerate(_version_names(self.sizes.versions))]
+        return {'totalHits': 1, 'data': [{'id': package, 'versions': versions, 'totalDownloads': 10 ** 7}]}
+
+    def _nuget_report(self, params: dict, package: str) -> dict:
+        group_by = params.get('groupBy', [])
+        versions = _version_names(self.sizes.versions)
+        clients = [f'NuGet Client {i}.0' for i in range(self.sizes.clients)]
+        if group_by == ['Version']:
+            table = [[{'Data': version}, {'Data': str(1000 + i)}] for i, version in enumerate(versions)]
+        elif group_by == ['ClientVersion']:
+            table = [[{'Data': client}, {'Data': str(5000 + i)}] for i, client in enumerate(clients)]
+        else:
+            table = []
+            for version in versions:
+                for i, client in enumerate(clients):
+                    table.append([{'Data': version} if i == 0 else None, {'Data': client}, {'Data': str(10 + i)}])
+        return {'Id': package, 'Table': table}
+
+    def _bestgems(self, params: dict, gem: str, endpoint: str) -> list:
+        rng = self._random('bestgems', gem, endpoint)
+        days = list(reversed(_days(self.sizes.days)))
+        if endpoint.endswith('ranking'):
+            return [{'date': day.isoformat(), 'total_ranking': rng.randint(1, 10 ** 5)} for day in days]
+        if endpoint == 'total_downloads':
+            total = 10 ** 7
+            rows = []
+            for day in days:
+                rows.append({'date': day.isoformat(), 'total_downloads': total})
+                total -= rng.randint(0, 10 ** 4)
+            return rows
+        return [{'date': day.isoformat(), 'total_downloads': rng.randint(0, 10 ** 4)} for day in days]
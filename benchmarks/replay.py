@@ -0,0 +1,153 @@
+import io
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+from benchmarks.fixtures import SyntheticFixtures
+from transport import Transport
+
+
+def fixture_filename(path: str, query: str = '') -> str:
+    return quote(path + (f'?{query}' if query else ''), safe='') + '.json'
+
+
+class ReplayServer:
+    # Serves recorded JSON from fixture_dir/<host>/<quoted path>.json, falling back to synthetic payloads.
+    # Requests arrive as /<host>/<path>?<query>, see ReplayTransport.
+
+    def __init__(self, fixture_dir: str = None, synthetic: SyntheticFixtures = None, port: int = 0):
+        self.fixture_dir = fixture_dir
+        self.synthetic = synthetic or SyntheticFixtures()
+        self.hits = Counter()
+        self.not_modified = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.hits.values())
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # buffer headers and body into one send; separate small writes stall on delayed ACKs
+            wbufsize = 64 * 1024
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                host, _, path = parts.path.lstrip('/').partition('/')
+                body = server.body(host, '/' + path, parts.query)
+                with server._lock:
+                    server.hits[host] += 1
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = f'"{zlib.crc32(body):08x}"'
+                if self.headers.get('If-None-Match') == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def body(self, host: str, path: str, query: str = ''):
+        key = (host, path, query)
+        with self._lock:
+            if key in self._bodies:
+                return self._bodies[key]
+        body = None
+        if self.fixture_dir:
+            recorded = os.path.join(self.fixture_dir, host, fixture_filename(path, query))
+            if os.path.exists(recorded):
+                with open(recorded, 'rb') as file:
+                    body = file.read()
+        if body is None:
+            payload = self.synthetic.payload(host, path, query)
+            if payload is not None:
+                body = json.dumps(payload).encode()
+        with self._lock:
+            self._bodies[key] = body
+        return body
+
+    def start(self) -> 'ReplayServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'ReplayServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class ReplayTransport(Transport):
+    # Sends every request to a ReplayServer instead of the real host, without rate limits.
+
+    def __init__(self, base_url: str, **kwargs):
+        kwargs.setdefault('host_rates', {})
+        kwargs.setdefault('default_rate', (10 ** 9, 10 ** 9))
+        kwargs.setdefault('max_retries', 0)
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+
+    def resolve(self, url: str) -> str:
+        parts = urlsplit(url)
+        return f'{self.base_url}/{parts.hostname}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+
+
+class RecordingTransport(Transport):
+    # Wraps the real transport and saves every JSON body in the layout ReplayServer reads.
+
+    def __init__(self, fixture_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.fixture_dir = fixture_dir
+
+    def get(self, url: str, params: dict = None, headers: dict = None, stream: bool = False):
+        response = super().get(url, params=params, headers=headers)
+        parts = urlsplit(response.url)
+        directory = os.path.join(self.fixture_dir, parts.hostname)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, fixture_filename(parts.path, parts.query)), 'wb') as file:
+            file.write(response.content)
+        return response
+
+    def get_parsed(self, url: str, parser, params: dict = None, headers: dict = None):
+        return parser(io.BytesIO(self.get(url, params=params, headers=headers).content))
+
+    def get_conditional(self, url: str, params: dict = None, headers: dict = None, validators: dict = None,
+                        parser=None) -> tuple:
+        # always asks for the full body so there is something to record
+        if parser is None:
+            return self.get_json(url, params=params, headers=headers), None
+        return self.get_parsed(url, parser, params=params, headers=headers), None
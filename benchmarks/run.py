@@ -0,0 +1,143 @@
+import argparse
+import gc
+import inspect
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import PHP
+import csharp
+import fetch
+import node
+import python
+import ruby
+from benchmarks.fixtures import FixtureSizes, SyntheticFixtures
+from benchmarks.replay import ReplayServer, ReplayTransport
+
+_NOW = datetime.now()
+
+# arguments handed to public methods, by parameter name
+ARGUMENTS = {
+    'date': _NOW - timedelta(days=3),
+    'start_date': _NOW - timedelta(days=365 * 3),
+    'end_date': _NOW,
+    'version_name': '9.9.9',
+    'version': '9.9.9',
+    'operating_system': 'Linux',
+    'python_version': '3.11',
+    'client': 'NuGet Client 3.0',
+}
+
+
+def _targets() -> list:
+    return [
+        ('python', lambda: python.PythonPackage('bench-package')),
+        ('PHP', lambda: PHP.PHPPackage('bench', 'package')),
+        ('node', lambda: node.NodePackage('bench', 'package')),
+        ('csharp', lambda: csharp.NugetPackage('Bench.Package')),
+        ('ruby', lambda: ruby.RubyGem('bench-gem')),
+    ]
+
+
+def _public_members(cls: type) -> list[tuple[str, object]]:
+    members = []
+    for name, member in inspect.getmembers(cls):
+        if name.startswith('_'):
+            continue
+        if isinstance(member, property) or inspect.isfunction(member):
+            members.append((name, member))
+    return members
+
+
+def _call(instance, name: str, member):
+    if isinstance(member, property):
+        return getattr(instance, name)
+    parameters = list(inspect.signature(member).parameters)[1:]
+    return getattr(instance, name)(**{parameter: ARGUMENTS[parameter] for parameter in parameters
+                                      if parameter in ARGUMENTS})
+
+
+def _consume(result):
+    # force lazily built results so their cost is measured
+    if isinstance(result, (list, tuple)) or hasattr(result, '__iter__') and not isinstance(result, (str, dict)):
+        for _ in result:
+            pass
+
+
+def measure(server: ReplayServer, module: str, factory, name: str, member, warm: bool = False) -> dict:
+    instance = factory()
+    if warm:
+        _consume(_call(instance, name, member))
+    else:
+        fetch.clear_cache()
+    gc.collect()
+    requests_before = server.request_count
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    error = None
+    try:
+        _consume(_call(instance, name, member))
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return {
+        'method': f'{module}.{type(instance).__name__}.{name}',
+        'requests': server.request_count - requests_before,
+        'seconds': round(elapsed, 4),
+        'peak_bytes': peak,
+        'objects': allocated,
+        'error': error,
+    }
+
+
+def run(sizes: FixtureSizes = None, fixture_dir: str = None, warm: bool = False, only: str = None) -> list[dict]:
+    results = []
+    with ReplayServer(fixture_dir=fixture_dir, synthetic=SyntheticFixtures(sizes)) as server:
+        previous = fetch.set_transport(ReplayTransport(server.base_url))
+        try:
+            for module, factory in _targets():
+                for name, member in _public_members(type(factory())):
+                    label = f'{module}.{name}'
+                    if only and only not in label:
+                        continue
+                    results.append(measure(server, module, factory, name, member, warm=warm))
+        finally:
+            fetch.set_transport(previous)
+            fetch.clear_cache()
+    return results
+
+
+def _print_table(results: list[dict]):
+    print(f"{'method':<72} {'requests':>8} {'seconds':>9} {'peak MiB':>9} {'objects':>10}")
+    for result in results:
+        print(f"{result['method']:<72} {result['requests']:>8} {result['seconds']:>9.4f} "
+              f"{result['peak_bytes'] / 2 ** 20:>9.2f} {result['objects']:>10}"
+              + (f"  ! {result['error']}" if result['error'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every public client method against a local replay server')
+    parser.add_argument('--versions', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=3650)
+    parser.add_argument('--fixtures', help='directory of recorded JSON fixtures, see benchmarks.replay')
+    parser.add_argument('--warm', action='store_true', help='measure with the response cache already filled')
+    parser.add_argument('--only', help='only run methods whose module.name contains this string')
+    parser.add_argument('--json', dest='json_path', help='also write results to this file as JSON')
+    args = parser.parse_args()
+
+    results = run(sizes=FixtureSizes(versions=args.versions, days=args.days), fixture_dir=args.fixtures,
+                  warm=args.warm, only=args.only)
+    _print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_TTL = 300
+
+# Seconds a response stays fresh, per host. Most of these sources only publish new numbers once a day.
+HOST_TTLS = {
+    'api.pepy.tech': 3600,
+    'pypistats.org': 3600,
+    'packagist.org': 900,
+    'api.npmjs.org': 900,
+    'registry.npmjs.org': 300,
+    'azuresearch-usnc.nuget.org': 900,
+    'www.nuget.org': 3600,
+    'bestgems.org': 3600,
+}
+
+_MISSING = object()
+
+
+def make_key(url: str, params: dict = None) -> str:
+    if not params:
+        return url
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}{urlencode(sorted(params.items()))}"
+
+
+def _host(key: str) -> str:
+    return urlsplit(key).hostname or ''
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = 1024, default_ttl: float = DEFAULT_TTL, host_ttls: dict = None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.host_ttls = dict(HOST_TTLS if host_ttls is None else host_ttls)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, key: str) -> float:
+        return self.host_ttls.get(_host(key), self.default_ttl)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value, validators = entry
+            if expires_at <= time.monotonic():
+                # expired bodies with validators stay around so the next request can be conditional
+                if not validators:
+                    del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def stale(self, key: str) -> tuple[Any, Optional[dict]]:
+        # (value, validators) for an entry whether or not it is still fresh
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return None, None
+            _, value, validators = entry
+            return value, validators
+
+    def set(self, key: str, value: Any, ttl: float = None, validators: dict = None):
+        if ttl is None:
+            ttl = self.ttl_for(key)
+        if self.max_size <= 0 or (ttl <= 0 and not validators):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + max(ttl, 0), value, validators or None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def invalidate_host(self, host: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if _host(key) == host]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import fetch
+from report import COLLECTORS, FIELDS, FORMATS, ManifestEntry, non_negative_int, read_manifest, write_rows
+from transport import DEFAULT_RATE, HOST_RATES, Transport
+
+# Layout of a crawl directory, per shard:
+#   shard-<n>.jsonl       collected rows, appended one package at a time
+#   shard-<n>.done        keys of packages whose rows are complete, appended after their rows
+#   shard-<n>.errors      the last error for packages that failed; they are retried on the next run
+
+
+def entry_key(entry: ManifestEntry) -> str:
+    return f'{entry.ecosystem}:{entry.label}'
+
+
+def shard_of(entry: ManifestEntry, shards: int) -> int:
+    # crc32 rather than hash() so the assignment survives restarts and PYTHONHASHSEED
+    return zlib.crc32(entry_key(entry).encode()) % shards
+
+
+def _shard_path(out_dir: str, shard: int, suffix: str) -> str:
+    return os.path.join(out_dir, f'shard-{shard}.{suffix}')
+
+
+def worker_rates(workers: int, host_rates: dict = None, default_rate: tuple = DEFAULT_RATE) -> tuple[dict, tuple]:
+    # each worker gets an equal slice of every host's budget so all processes together stay within it
+    def share(rate: tuple) -> tuple:
+        per_second, burst = rate
+        return per_second / workers, max(1.0, burst / workers)
+
+    host_rates = HOST_RATES if host_rates is None else host_rates
+    return {host: share(rate) for host, rate in host_rates.items()}, share(default_rate)
+
+
+def completed_keys(out_dir: str, shard: int) -> set[str]:
+    path = _shard_path(out_dir, shard, 'done')
+    if not os.path.exists(path):
+        return set()
+    with open(path) as file:
+        return {line.rstrip('\n') for line in file if line.strip()}
+
+
+def _trim_partial_line(path: str):
+    # a crash mid-write can leave a line without its newline; cut it off so the next append starts a fresh line
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        size = end = file.seek(0, os.SEEK_END)
+        # scan back from the end, a block at a time, for the last newline
+        while end > 0:
+            start = max(end - 4096, 0)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            file.truncate(end)
+
+
+def _append(path: str, lines: list[str]):
+    with open(path, 'a') as file:
+        file.writelines(lines)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def crawl_shard(out_dir: str, shard: int, entries: list[ManifestEntry], days: int, workers: int,
+                transport_factory: Callable = None) -> tuple[int, int, int]:
+    # runs in a worker process; returns (collected, skipped, failed)
+    host_rates, default_rate = worker_rates(workers)
+    factory = transport_factory or Transport
+    fetch.set_transport(factory(host_rates=host_rates, default_rate=default_rate))
+
+    for suffix in ('jsonl', 'done'):
+        _trim_partial_line(_shard_path(out_dir, shard, suffix))
+    done = completed_keys(out_dir, shard)
+    collected = skipped = failed = 0
+    errors = {}
+    for entry in entries:
+        key = entry_key(entry)
+        if key in done:
+            skipped += 1
+            continue
+        collector = COLLECTORS.get(entry.ecosystem)
+        try:
+            if collector is None:
+                raise ValueError(f'unknown ecosystem {entry.ecosystem}')
+            rows = collector(entry, days)
+        except Exception as e:
+            failed += 1
+            errors[key] = f'{type(e).__name__}: {e}'
+            continue
+        # rows first, then the checkpoint: a crash in between only repeats rows, which merge drops
+        _append(_shard_path(out_dir, shard, 'jsonl'), [json.dumps(row) + '\n' for row in rows])
+        _append(_shard_path(out_dir, shard, 'done'), [key + '\n'])
+        collected += 1
+
+    errors_path = _shard_path(out_dir, shard, 'errors')
+    if errors:
+        with open(errors_path, 'w') as file:
+            json.dump(errors, file, indent=1)
+    elif os.path.exists(errors_path):
+        os.remove(errors_path)
+    return collected, skipped, failed
+
+
+def crawl(entries: list[ManifestEntry], out_dir: str, workers: int = 4, days: int = 30,
+          transport_factory: Callable = None) -> tuple[int, int, int]:
+    os.makedirs(out_dir, exist_ok=True)
+    workers = max(1, workers)
+    shards = [[] for _ in range(workers)]
+    for entry in entries:
+        shards[shard_of(entry, workers)].append(entry)
+    with open(os.path.join(out_dir, 'crawl.json'), 'w') as file:
+        # a resumed crawl has to shard the same way, so the worker count is kept with the output
+        json.dump({'workers': workers, 'days': days}, file)
+
+    totals = [0, 0, 0]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(crawl_shard, out_dir, shard, shard_entries, days, workers, transport_factory)
+                   for shard, shard_entries in enumerate(shards) if shard_entries]
+        for future in futures:
+            for i, count in enumerate(future.result()):
+                totals[i] += count
+    return tuple(totals)
+
+
+def merge(out_dir: str) -> list[dict]:
+    rows = {}
+    for name in sorted(os.listdir(out_dir)):
+        if not (name.startswith('shard-') and name.endswith('.jsonl')):
+            continue
+        with open(os.path.join(out_dir, name)) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+                rows[tuple(row[field] for field in FIELDS[:-1])] = row
+    return [rows[key] for key in sorted(rows)]
+
+
+def crawl_errors(out_dir: str) -> dict[str, str]:
+    errors = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith('shard-') and name.endswith('.errors'):
+            with open(os.path.join(out_dir, name)) as file:
+                errors.update(json.load(file))
+    return errors
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Crawl stats for a large package list across worker processes')
+    parser.add_argument('manifest', help='JSON or CSV manifest of packages (ecosystem, author, name)')
+    parser.add_argument('--out-dir', default='crawl', help='shard outputs and checkpoints; rerun to resume')
+    parser.add_argument('--workers', type=int, help='worker processes; defaults to the count of a resumed crawl or 4')
+    parser.add_argument('--days', type=non_negative_int, default=30,
+                        help='days of daily downloads per package; 0 for headline numbers only')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--output', help='merged output file; defaults to stdout for csv and jsonl')
+    args = parser.parse_args(argv)
+
+    workers = args.workers
+    settings_path = os.path.join(args.out_dir, 'crawl.json')
+    if os.path.exists(settings_path):
+        with open(settings_path) as file:
+            previous = json.load(file)
+        if workers and workers != previous['workers']:
+            raise SystemExit(f'{args.out_dir} was crawled with {previous["workers"]} workers; resume with the same')
+        workers = previous['workers']
+
+    collected, skipped, failed = crawl(read_manifest(args.manifest), out_dir=args.out_dir, workers=workers or 4,
+                                       days=args.days)
+    print(f'collected {collected}, already done {skipped}, failed {failed}', file=sys.stderr)
+    write_rows(merge(args.out_dir), output_format=args.format, file_path=args.output)
+    for key, error in crawl_errors(args.out_dir).items():
+        print(f'{key}: {error}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,47 @@
-import objectrest
+from concurrent.futures import ThreadPoolExecutor
 
+import fetch
+from metrics import bind_caller, instrument
 
+
+VERSION_PARAMS = "?groupBy=Version"
+CLIENT_PARAMS = "?groupBy=ClientVersion"
+VERSION_CLIENT_PARAMS = "?groupBy=ClientVersion&groupBy=Version"
+
+
+def _info_url(package_name: str) -> str:
+    return f"https://azuresearch-usnc.nuget.org/query?q={package_name}&prerelease=false"
+
+
+def _stats_url(package_name: str, params: str = "") -> str:
+    return f'https://www.nuget.org/stats/reports/packages/{package_name}{params}'
+
+
+@instrument
 def _info_api_call(package_name: str) -> dict:
-    return objectrest.get_json(f"https://azuresearch-usnc.nuget.org/query?q={package_name}&prerelease=false")
+    return fetch.get_json(_info_url(package_name))
 
 
+@instrument
 def _stats_api_call(package_name: str, params: str = "") -> dict:
-    return objectrest.get_json(
-        f'https://www.nuget.org/stats/reports/packages/{package_name}{params}')
+    return fetch.get_json(_stats_url(package_name, params))
 
 
 def _version_api_call(package_name: str) -> dict:
-    params = "?groupBy=Version"
-    return _stats_api_call(package_name, params)
+    return _stats_api_call(package_name, VERSION_PARAMS)
 
 
 def _client_api_call(package_name: str) -> dict:
-    params = "?groupBy=ClientVersion"
-    return _stats_api_call(package_name, params)
+    return _stats_api_call(package_name, CLIENT_PARAMS)
 
 
 def _version_client_api_call(package_name: str) -> dict:
-    params = "?groupBy=ClientVersion&groupBy=Version"
-    return _stats_api_call(package_name, params)
+    return _stats_api_call(package_name, VERSION_CLIENT_PARAMS)
 
 
 class NugetPackageClient:
+    __slots__ = ('_package_name', 'client_version', 'total_downloads')
+
     def __init__(self, package_name: str, client_version: str, total_downloads: int):
         self._package_name = package_name
         self.client_version = client_version
@@ -33,14 +49,82 @@ class NugetPackageClient:
 
 
 class NugetPackageVersion:
+    __slots__ = ('_package_name', 'version', 'total_downloads', 'client_data')
+
     def __init__(self, package_name: str, version: str, total_downloads: int, client_data: dict = None):
         self._package_name = package_name
         self.version = version
         self.total_downloads = total_downloads
-        self.clients = []
-        if client_data:
-            for client in client_data:
-                self.clients.append(NugetPackageClient(package_name, client["ClientVersion"], client["Downloads"]))
+        # client version -> downloads
+        self.client_data = client_data or {}
+
+    @property
+    def clients(self) -> list[NugetPackageClient]:
+        return [NugetPackageClient(self._package_name, client_version, downloads)
+                for client_version, downloads in self.client_data.items()]
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _process_versions(package_name: str, data: dict) -> list[NugetPackageVersion]:
+    version_data = data.get('data')[0].get('versions', [])
+    versions = []
+    for version in version_data:
+        versions.append(NugetPackageVersion(package_name=package_name, version=version.get('version'),
+                                            total_downloads=version.get('downloads')))
+    return versions
+
+
+def _group_clients_by_version(client_version_data: list) -> dict:
+    # Each version's block starts with a row naming the version; the rows after it leave that cell empty
+    # and belong to the same version, so one pass over the table groups every block.
+    grouped = {}
+    client_data = None
+    for row in client_version_data:
+        if row[0] is not None:
+            name = row[0].get('Data')
+            client_data = grouped.get(name)
+            if client_data is None:
+                client_data = grouped[name] = {}
+        elif client_data is None:
+            continue
+        client_data[row[1].get('Data')] = _to_int(row[2].get('Data'))
+    return grouped
+
+
+def _process_detailed_versions(package_name: str, version_data: list, client_version_data: list) \
+        -> list[NugetPackageVersion]:
+    grouped = _group_clients_by_version(client_version_data)
+    versions = []
+    for entry in version_data:
+        name = entry[0].get('Data')
+        download_count = _to_int(entry[1].get('Data'))
+        versions.append(
+            NugetPackageVersion(package_name=package_name, version=name, total_downloads=download_count,
+                                client_data=grouped.get(name)))
+    return versions
+
+
+def _process_clients(package_name: str, data: list) -> list[NugetPackageClient]:
+    clients = []
+    for entry in data:
+        name = entry[0].get('Data')
+        download_count = _to_int(entry[1].get('Data'))
+        clients.append(
+            NugetPackageClient(package_name=package_name, client_version=name, total_downloads=download_count))
+    return clients
+
+
+def _sum_version_downloads(data: list) -> int:
+    total = 0
+    for entry in data:
+        total += int(entry[1].get('Data'))
+    return total
 
 
 class NugetPackage:
@@ -49,13 +133,7 @@ class NugetPackage:
 
     @property
     def versions(self) -> list[NugetPackageVersion]:
-        data = _info_api_call(self.package_name).get('data')[0]
-        version_data = data.get('versions', {})
-        versions = []
-        for version in version_data.items():
-            versions.append(NugetPackageVersion(package_name=self.package_name, version=version.get('version'),
-                                                total_downloads=version.get('downloads')))
-        return versions
+        return _process_versions(package_name=self.package_name, data=_info_api_call(self.package_name))
 
     @property
     def latest_version(self) -> NugetPackageVersion:
@@ -64,63 +142,25 @@ class NugetPackage:
 
     @property
     def detailed_versions(self) -> list[NugetPackageVersion]:
-        version_data = _version_api_call(self.package_name).get('Table')
-        client_version_data = _version_client_api_call(self.package_name).get('Table')
-        versions = []
-        for entry in version_data:
-            name = entry[0].get('Data')
-            download_count = entry[1].get('Data')
-            try:
-                download_count = int(download_count)
-            except ValueError:
-                download_count = 0
-
-            client_data = {}
-            version_starts_at = 0
-            for i in range(0, len(client_version_data)):
-                if client_version_data[i][0] is None:
-                    pass
-                elif client_version_data[i][0].get('Data') == name:
-                    # store the first entry for this version
-                    client_data[client_version_data[i][1].get('Data')] = int(client_version_data[i][2].get('Data'))
-                    version_starts_at = i
-                    break
-            # store all subsequent entries for this version until we find a new version
-            for client_entry in client_version_data[version_starts_at + 1:]:
-                if client_entry[0] is None:
-                    client_data[client_entry[1].get('Data')] = int(client_entry[2].get('Data'))
-                else:
-                    break
-
-            versions.append(
-                NugetPackageVersion(package_name=self.package_name, version=name, total_downloads=download_count,
-                                    client_data=client_data))
-        return versions
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            version_future = executor.submit(bind_caller(_version_api_call), self.package_name)
+            client_version_future = executor.submit(bind_caller(_version_client_api_call), self.package_name)
+            version_data = version_future.result().get('Table')
+            client_version_data = client_version_future.result().get('Table')
+        return _process_detailed_versions(package_name=self.package_name, version_data=version_data,
+                                          client_version_data=client_version_data)
 
     @property
     def clients(self) -> list[NugetPackageClient]:
         data = _client_api_call(self.package_name).get('Table')
-        clients = []
-        for entry in data:
-            name = entry[0].get('Data')
-            download_count = entry[1].get('Data')
-            try:
-                download_count = int(download_count)
-            except ValueError:
-                download_count = 0
-            clients.append(
-                NugetPackageClient(package_name=self.package_name, client_version=name, total_downloads=download_count))
-        return clients
+        return _process_clients(package_name=self.package_name, data=data)
 
     # "recent" is the last 6 weeks
 
     @property
     def recent_total_downloads(self) -> int:
         data = _version_api_call(self.package_name).get('Table')
-        total = 0
-        for entry in data:
-            total += int(entry[1].get('Data'))
-        return total
+        return _sum_version_downloads(data)
 
     def recent_total_downloads_by_version(self, version: str) -> int:
         versions = self.versions
@@ -0,0 +1,118 @@
+import contextlib
+import contextvars
+import io
+import json
+
+import metrics
+from cache import ResponseCache, make_key
+from singleflight import SingleFlight
+from transport import NOT_MODIFIED, Transport
+
+response_cache = ResponseCache()
+transport = Transport()
+in_flight = SingleFlight()
+
+# keys already sent upstream inside the current revalidate() block, or None outside one
+_revalidated = contextvars.ContextVar('revalidated', default=None)
+
+
+def set_transport(new_transport) -> Transport:
+    # anything with a get_json(url, params=None) method can stand in for the default transport; aio.AsyncSession
+    # needs a Transport's rate limits and retries, and uses its own Transport while a stand-in is set
+    global transport
+    previous, transport = transport, new_transport
+    return previous
+
+
+def _key(url: str, params: dict = None, headers: dict = None, suffix: str = None) -> str:
+    key = make_key(url, params)
+    if headers:
+        key += '#' + '&'.join(f'{name}={value}' for name, value in sorted(headers.items()))
+    if suffix:
+        key += f'#{suffix}'
+    return key
+
+
+@contextlib.contextmanager
+def revalidate():
+    # Inside the block the first read of each key goes upstream even when its cache entry is still fresh, as a
+    # conditional request when the entry has validators; later reads of the key use what that request returned.
+    token = _revalidated.set(set())
+    try:
+        yield
+    finally:
+        _revalidated.reset(token)
+
+
+def _load(key: str, use_cache: bool, request):
+    # request(validators) returns (data, validators), with data NOT_MODIFIED when the cached body is still current
+    revalidated = _revalidated.get()
+    force = revalidated is not None and key not in revalidated
+    if force:
+        revalidated.add(key)
+    if use_cache and not force:
+        data = response_cache.get(key)
+        if data is not None:
+            metrics.observe_cache_hit()
+            return data
+
+    def leader_request():
+        # a leader that finished between our cache check and joining may already have filled the cache
+        stale, validators = None, None
+        if use_cache:
+            cached = None if force else response_cache.get(key)
+            if cached is not None:
+                return cached
+            stale, validators = response_cache.stale(key)
+        result, validators = request(validators if stale is not None else None)
+        if result is NOT_MODIFIED:
+            result = stale
+        if use_cache and result is not None:
+            response_cache.set(key, result, validators=validators)
+        return result
+
+    # concurrent callers for the same key wait on one upstream request and share its parsed result
+    data, shared = in_flight.do(key, leader_request)
+    if shared:
+        metrics.observe_coalesced()
+    return data
+
+
+def get_json(url: str, params: dict = None, use_cache: bool = True, headers: dict = None):
+    def request(validators):
+        if hasattr(transport, 'get_conditional'):
+            return transport.get_conditional(url, params=params, headers=headers, validators=validators)
+        if headers:
+            return transport.get_json(url, params=params, headers=headers), None
+        return transport.get_json(url, params=params), None
+
+    return _load(_key(url, params, headers), use_cache, request)
+
+
+def get_parsed(url: str, parser, params: dict = None, use_cache: bool = True, headers: dict = None):
+    # Like get_json, but parser reads the body as a stream and only its result is cached.
+    # Transports without get_parsed fall back to parsing the whole decoded document.
+    def request(validators):
+        if hasattr(transport, 'get_conditional'):
+            return transport.get_conditional(url, params=params, headers=headers, validators=validators,
+                                             parser=parser)
+        if hasattr(transport, 'get_parsed'):
+            return transport.get_parsed(url, parser, params=params, headers=headers), None
+        return parser(io.BytesIO(json.dumps(transport.get_json(url, params=params)).encode())), None
+
+    return _load(_key(url, params, headers, suffix=parser.__name__), use_cache, request)
+
+
+def invalidate(url: str, params: dict = None) -> bool:
+    # also drops the entries kept per request headers or parser, see _key
+    key = make_key(url, params)
+    removed = response_cache.invalidate(key)
+    return response_cache.invalidate_prefix(f'{key}#') > 0 or removed
+
+
+def invalidate_host(host: str) -> int:
+    return response_cache.invalidate_host(host)
+
+
+def clear_cache():
+    response_cache.clear()
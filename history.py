@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+PYPI = 'pypi'
+PACKAGIST = 'packagist'
+NPM = 'npm'
+NUGET = 'nuget'
+RUBYGEMS = 'rubygems'
+
+# package-level series are stored under an empty version
+ALL_VERSIONS = ''
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS downloads (
+    ecosystem TEXT NOT NULL,
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    date TEXT NOT NULL,
+    downloads INTEGER NOT NULL,
+    PRIMARY KEY (ecosystem, package, version, date)
+) WITHOUT ROWID
+'''
+
+
+def _date_to_str(date: datetime) -> str:
+    return date.strftime('%Y-%m-%d')
+
+
+def _str_to_date(date: str) -> datetime:
+    return datetime.strptime(date[:10], '%Y-%m-%d')
+
+
+class HistoryStore:
+    def __init__(self, path: str = 'package_stats.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def date_range(self, ecosystem: str, package: str, version: str = ALL_VERSIONS) \
+            -> tuple[Optional[str], Optional[str]]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT MIN(date), MAX(date) FROM downloads WHERE ecosystem = ? AND package = ? AND version = ?',
+                (ecosystem, package, version)).fetchone()
+        return row[0], row[1]
+
+    def last_date(self, ecosystem: str, package: str, version: str = ALL_VERSIONS) -> Optional[str]:
+        return self.date_range(ecosystem=ecosystem, package=package, version=version)[1]
+
+    def save(self, ecosystem: str, package: str, rows: Iterable[tuple[str, int]], version: str = ALL_VERSIONS):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO downloads (ecosystem, package, version, date, downloads) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((ecosystem, package, version, date[:10], downloads or 0) for date, downloads in rows))
+
+    def load(self, ecosystem: str, package: str, version: str = ALL_VERSIONS, start_date: datetime = None,
+             end_date: datetime = None) -> list[tuple[str, int]]:
+        query = 'SELECT date, downloads FROM downloads WHERE ecosystem = ? AND package = ? AND version = ?'
+        params = [ecosystem, package, version]
+        if start_date:
+            query += ' AND date >= ?'
+            params.append(_date_to_str(start_date))
+        if end_date:
+            query += ' AND date <= ?'
+            params.append(_date_to_str(end_date))
+        with self._lock:
+            return self._connection.execute(query + ' ORDER BY date', params).fetchall()
+
+    def refresh_start(self, ecosystem: str, package: str, start_date: datetime = None,
+                      version: str = ALL_VERSIONS) -> Optional[datetime]:
+        # Where the next fetch should begin. The last stored day is fetched again because upstream
+        # sources publish the most recent day before it is complete.
+        first, last = self.date_range(ecosystem=ecosystem, package=package, version=version)
+        if last is None or (start_date and _date_to_str(start_date) < first):
+            return start_date
+        # starting after the last stored day still fetches from it, so no hole is left in between
+        return _str_to_date(last)
+
+    def missing_range(self, ecosystem: str, package: str, start_date: datetime, end_date: datetime,
+                      version: str = ALL_VERSIONS) -> Optional[tuple[datetime, datetime]]:
+        # The smallest span to fetch so every day from start_date to end_date is stored, or None when it already is.
+        # Only days actually stored in the range count, so a hole anywhere inside it is fetched again, and the
+        # last stored day always counts as missing for the same reason as in refresh_start.
+        start, end = _str_to_date(_date_to_str(start_date)), _str_to_date(_date_to_str(end_date))
+        if start > end:
+            return None
+        last = self.last_date(ecosystem=ecosystem, package=package, version=version)
+        stored = {date for date, _ in self.load(ecosystem=ecosystem, package=package, version=version,
+                                                start_date=start, end_date=end) if date != last}
+        missing = [day for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+                   if _date_to_str(day) not in stored]
+        if not missing:
+            return None
+        return missing[0], missing[-1]
+
+    def merge(self, ecosystem: str, package: str, rows: Iterable[tuple[str, int]], version: str = ALL_VERSIONS):
+        # Only keep rows from the last stored day onward; older days never change upstream.
+        last = self.last_date(ecosystem=ecosystem, package=package, version=version)
+        if last is not None:
+            rows = [(date, downloads) for date, downloads in rows if date[:10] >= last]
+        self.save(ecosystem=ecosystem, package=package, rows=rows, version=version)
+
+    def delete(self, ecosystem: str, package: str, version: str = None):
+        query = 'DELETE FROM downloads WHERE ecosystem = ? AND package = ?'
+        params = [ecosystem, package]
+        if version is not None:
+            query += ' AND version = ?'
+            params.append(version)
+        with self._lock, self._connection:
+            self._connection.execute(query, params)
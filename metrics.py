@@ -0,0 +1,266 @@
+import contextvars
+import functools
+import inspect
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# modules whose public methods are reported as the caller of a fetch
+CLIENT_MODULES = {'python', 'PHP', 'node', 'csharp', 'ruby', 'planner', 'aio'}
+
+_current_event = contextvars.ContextVar('fetch_event', default=None)
+_bound_caller = contextvars.ContextVar('bound_caller', default=None)
+
+
+class FetchEvent:
+    __slots__ = ('endpoint', 'caller', 'seconds', 'requests', 'cache_hits', 'coalesced', 'not_modified',
+                 'response_bytes', 'parse_seconds', 'request_seconds', 'error')
+
+    def __init__(self, endpoint: str, caller: str):
+        self.endpoint = endpoint
+        self.caller = caller
+        self.seconds = 0.0
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.response_bytes = 0
+        self.parse_seconds = 0.0
+        self.request_seconds = 0.0
+        self.error = None
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.response_bytes = 0
+        self.parse_seconds = 0.0
+        self.latency = Histogram()
+
+
+class Metrics:
+    def __init__(self):
+        self._stats = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback: Callable[[FetchEvent], None]):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[FetchEvent], None]):
+        self._callbacks.remove(callback)
+
+    def record(self, event: FetchEvent):
+        with self._lock:
+            stats = self._stats.get((event.endpoint, event.caller))
+            if stats is None:
+                stats = self._stats[(event.endpoint, event.caller)] = EndpointStats()
+            stats.calls += 1
+            stats.requests += event.requests
+            stats.cache_hits += event.cache_hits
+            stats.coalesced += event.coalesced
+            stats.not_modified += event.not_modified
+            stats.errors += event.error is not None
+            stats.response_bytes += event.response_bytes
+            stats.parse_seconds += event.parse_seconds
+            if event.requests:
+                stats.latency.observe(event.seconds)
+        for callback in list(self._callbacks):
+            callback(event)
+
+    def stats(self) -> dict[tuple[str, str], EndpointStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def prometheus(self, prefix: str = 'package_stats') -> str:
+        stats = self.stats()
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples: list[tuple[str, str, object]]):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{prefix}_{name}{suffix}{{{labels}}} {value}')
+
+        def labels(endpoint: str, caller: str, extra: str = '') -> str:
+            return f'endpoint="{_escape(endpoint)}",caller="{_escape(caller)}"{extra}'
+
+        counters = (
+            ('fetch_calls_total', 'Fetch helper calls', 'calls'),
+            ('http_requests_total', 'HTTP requests sent', 'requests'),
+            ('cache_hits_total', 'Fetch helper calls answered from the response cache', 'cache_hits'),
+            ('coalesced_total', "Fetch helper calls that shared another caller's in-flight request", 'coalesced'),
+            ('not_modified_total', 'HTTP requests answered 304 Not Modified from a cached body', 'not_modified'),
+            ('fetch_errors_total', 'Fetch helper calls that raised', 'errors'),
+            ('response_bytes_total', 'Response body bytes received', 'response_bytes'),
+            ('json_parse_seconds_total', 'Seconds spent decoding JSON responses', 'parse_seconds'),
+        )
+        for name, help_text, attribute in counters:
+            family(name, 'counter', help_text,
+                   [('', labels(endpoint, caller), getattr(entry, attribute))
+                    for (endpoint, caller), entry in stats.items()])
+
+        samples = []
+        for (endpoint, caller), entry in stats.items():
+            for bound, count in entry.latency.cumulative():
+                samples.append(('_bucket', labels(endpoint, caller, f',le="{bound}"'), count))
+            samples.append(('_bucket', labels(endpoint, caller, ',le="+Inf"'), entry.latency.count))
+            samples.append(('_sum', labels(endpoint, caller), entry.latency.sum))
+            samples.append(('_count', labels(endpoint, caller), entry.latency.count))
+        family('fetch_latency_seconds', 'histogram', 'Latency of fetch helper calls that went to the network',
+               samples)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Metrics()
+
+
+def _public_caller(frame) -> str:
+    # The outermost public client method in the run of client-module frames above the helper, i.e. the one
+    # application code called. The walk stops at the first frame outside that run, since this is on every call.
+    caller = None
+    while frame is not None and frame.f_globals.get('__name__') in CLIENT_MODULES:
+        name = frame.f_code.co_name
+        if name[0] not in '_<':
+            owner = frame.f_locals.get('self')
+            caller = f'{type(owner).__name__}.{name}' if owner is not None else name
+        frame = frame.f_back
+    return caller or _bound_caller.get() or 'unknown'
+
+
+def bind_caller(func: Callable) -> Callable:
+    # Worker threads lose the calling stack; capture the public caller now so fetches made by func keep it.
+    caller = _public_caller(sys._getframe(1))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _bound_caller.set(caller)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _bound_caller.reset(token)
+
+    return wrapper
+
+
+def current_event() -> Optional[FetchEvent]:
+    return _current_event.get()
+
+
+def observe_cache_hit():
+    event = _current_event.get()
+    if event is not None:
+        event.cache_hits += 1
+
+
+def observe_coalesced():
+    event = _current_event.get()
+    if event is not None:
+        event.coalesced += 1
+
+
+def observe_not_modified(request_seconds: float):
+    event = _current_event.get()
+    if event is not None:
+        event.requests += 1
+        event.not_modified += 1
+        event.request_seconds += request_seconds
+
+
+def observe_response(request_seconds: float, response_bytes: int, parse_seconds: float):
+    event = _current_event.get()
+    if event is not None:
+        event.requests += 1
+        event.request_seconds += request_seconds
+        event.response_bytes += response_bytes
+        event.parse_seconds += parse_seconds
+
+
+def instrument(func: Callable) -> Callable:
+    endpoint = f'{func.__module__}.{func.__qualname__}'
+    if inspect.iscoroutinefunction(func):
+        return _instrument_async(func, endpoint)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_event.get() is not None:
+            # already inside an instrumented helper; the outer one owns the event
+            return func(*args, **kwargs)
+        event = FetchEvent(endpoint=endpoint, caller=_public_caller(sys._getframe(1)))
+        token = _current_event.set(event)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            event.error = e
+            raise
+        finally:
+            event.seconds = time.perf_counter() - started
+            _current_event.reset(token)
+            registry.record(event)
+
+    return wrapper
+
+
+def _instrument_async(func: Callable, endpoint: str) -> Callable:
+    # Same as instrument for coroutines. Tasks copy the context when they are created, so tasks started inside
+    # func count against its event too. Calls gathered as tasks of their own have no client frame above them and
+    # report the caller as unknown.
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _current_event.get() is not None:
+            return await func(*args, **kwargs)
+        event = FetchEvent(endpoint=endpoint, caller=_public_caller(sys._getframe(1)))
+        token = _current_event.set(event)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            event.error = e
+            raise
+        finally:
+            event.seconds = time.perf_counter() - started
+            _current_event.reset(token)
+            registry.record(event)
+
+    return wrapper
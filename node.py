@@ -1,76 +1,248 @@
-from datetime import datetime, timedelta
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 
-import objectrest
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+import fetch
+from history import HistoryStore, NPM
+from metrics import bind_caller, instrument
+from series import DatedStat, DownloadSeries
+
+
+# npm serves at most 18 months per single-package range request, but only a year per bulk request,
+# and at most 128 unscoped packages per bulk request
+MAX_RANGE_DAYS = 540
+MAX_BULK_RANGE_DAYS = 365
+MAX_BULK_PACKAGES = 128
+
+# the abbreviated "corgi" document: version manifests trimmed to what installers need, no release times
+ABBREVIATED_METADATA = {'Accept': 'application/vnd.npm.install-v1+json'}
 
 
 def _date_to_str(date: datetime) -> str:
     return date.strftime("%Y-%m-%d")
 
 
-def _stats_api_call(package_str: str, start_date: datetime, end_date: datetime) -> dict:
+def _day(value: datetime) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _stats_url(package_str: str, start_date: datetime, end_date: datetime) -> str:
     start = _date_to_str(start_date)
     end = _date_to_str(end_date)
-    return objectrest.get_json(f"https://api.npmjs.org/downloads/range/{start}:{end}/{package_str}")
+    return f"https://api.npmjs.org/downloads/range/{start}:{end}/{package_str}"
+
+
+def _info_url(package_str: str) -> str:
+    return f"https://registry.npmjs.org/{package_str}"
+
+
+def _version_info_url(package_str: str, version_name: str) -> str:
+    return f"https://registry.npmjs.org/{package_str}/{version_name}"
+
 
+def _read_release_dates(stream) -> tuple[list[str], dict]:
+    # Only the keys of "versions" and the "time" map are kept; manifests are skipped without being built.
+    if ijson is None:
+        data = json.load(stream)
+        return list(data.get('versions', {})), data.get('time', {})
+    names = []
+    release_dates = {}
+    time_key = time_prefix = None
+    for prefix, event, value in ijson.parse(stream):
+        if event == 'map_key':
+            if prefix == 'versions':
+                names.append(value)
+            elif prefix == 'time':
+                time_key, time_prefix = value, f'time.{value}'
+        elif event == 'string' and prefix == time_prefix:
+            release_dates[time_key] = value
+    return names, release_dates
 
+
+@instrument
+def _release_dates_api_call(package_str: str) -> tuple[list[str], dict]:
+    return fetch.get_parsed(_info_url(package_str), _read_release_dates)
+
+
+@instrument
+def _abbreviated_info_api_call(package_str: str) -> dict:
+    return fetch.get_json(_info_url(package_str), headers=ABBREVIATED_METADATA)
+
+
+@instrument
+def _version_info_api_call(package_str: str, version_name: str) -> dict:
+    return fetch.get_json(_version_info_url(package_str, version_name))
+
+
+@instrument
+def _stats_api_call(package_str: str, start_date: datetime, end_date: datetime) -> dict:
+    return fetch.get_json(_stats_url(package_str, start_date, end_date))
+
+
+@instrument
 def _info_api_call(package_str: str) -> dict:
-    return objectrest.get_json(f"https://registry.npmjs.org/{package_str}")
+    return fetch.get_json(_info_url(package_str))
+
+
+def _date_chunks(start_date: datetime, end_date: datetime, max_days: int = MAX_RANGE_DAYS) -> list[tuple[date, date]]:
+    start, end = _day(start_date), _day(end_date)
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=max_days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
 
 
-class NodePackageDownloadStat:
+def _package_batches(package_strs: list[str]) -> list[tuple[str, ...]]:
+    # scoped packages are not allowed in bulk queries, so each one gets its own request
+    unscoped = [package_str for package_str in package_strs if not package_str.startswith('@')]
+    batches = [tuple(unscoped[i:i + MAX_BULK_PACKAGES]) for i in range(0, len(unscoped), MAX_BULK_PACKAGES)]
+    batches.extend((package_str,) for package_str in package_strs if package_str.startswith('@'))
+    return batches
+
+
+def _range_api_call(package_strs: tuple[str, ...], start_date: date, end_date: date) -> dict:
+    data = _stats_api_call(",".join(package_strs), start_date, end_date)
+    if len(package_strs) == 1:
+        # a single package is answered with a plain document rather than a package -> document map
+        return {package_strs[0]: data}
+    return data
+
+
+def _range_tasks(package_strs: list[str], start_date: datetime, end_date: datetime) -> list[tuple]:
+    # (batch, chunk start, chunk end) per request; each package is in one batch, with its chunks in date order
+    return [(batch, chunk_start, chunk_end)
+            for batch in _package_batches(package_strs)
+            for chunk_start, chunk_end in _date_chunks(start_date, end_date,
+                                                       MAX_RANGE_DAYS if len(batch) == 1 else MAX_BULK_RANGE_DAYS)]
+
+
+def _fetch_download_rows(package_strs: list[str], start_date: datetime, end_date: datetime,
+                         max_workers: int = 8) -> dict[str, list]:
+    tasks = _range_tasks(package_strs, start_date, end_date)
+    if len(tasks) <= 1:
+        results = [_range_api_call(*task) for task in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            results = list(executor.map(bind_caller(lambda task: _range_api_call(*task)), tasks))
+
+    # results follow the task order, so each package's rows are stitched back together in date order
+    rows = {package_str: [] for package_str in package_strs}
+    for result in results:
+        for package_str, data in result.items():
+            if data and package_str in rows:
+                rows[package_str].extend(data.get('downloads') or [])
+    return rows
+
+
+class NodePackageDownloadStat(DatedStat):
+    __slots__ = ('downloads',)
+
     def __init__(self, date: str, downloads: int):
-        self.date = date
+        super().__init__(date)
         self.downloads = downloads
 
 
 class NodePackageVersion:
-    def __init__(self, version_name: str, release_date: str, data: dict):
+    __slots__ = ('version_name', 'release_date', '_data', '_package_name')
+
+    def __init__(self, version_name: str, release_date: str, data: dict = None, package_name: str = None):
         self.version_name = version_name
         self.release_date = release_date
-        self.downloads = data
-        self._package_name = data["name"]
+        self._data = data
+        self._package_name = package_name or data["name"]
+
+    @property
+    def downloads(self) -> dict:
+        # the version's manifest; compact versions fetch it on first access
+        if self._data is None:
+            self._data = _version_info_api_call(self._package_name, self.version_name)
+        return self._data
+
+
+def _process_download_stats(data: list) -> DownloadSeries:
+    return DownloadSeries.from_rows(data, date_key='day', value_key='downloads', stat_type=NodePackageDownloadStat)
+
+
+def _process_versions(data: dict) -> list[NodePackageVersion]:
+    versions = []
+    date_data = data['time']
+    package_name = data["name"]
+    # the manifests are already in the parsed packument, so versions keep a reference instead of refetching them
+    for name, manifest in data["versions"].items():
+        date = date_data[name]
+        versions.append(NodePackageVersion(version_name=name, release_date=date, data=manifest,
+                                           package_name=package_name))
+    return versions
+
 
+def _process_release_dates(package_str: str, names: list[str], release_dates: dict) -> list[NodePackageVersion]:
+    return [NodePackageVersion(version_name=name, release_date=release_dates.get(name), package_name=package_str)
+            for name in names]
 
-def _process_download_stats(data: dict) -> list[NodePackageDownloadStat]:
-    stats = []
-    for item in data:
-        stats.append(NodePackageDownloadStat(date=item['day'], downloads=item['downloads']))
-    return stats
 
+def _package_str(author_name: str, package_name: str) -> str:
+    # author_name may be empty for unscoped packages
+    if not author_name:
+        return package_name
+    return f"@{author_name}/{package_name}"
 
-def _sum_downloads(stats: list[NodePackageDownloadStat]) -> int:
-    return sum([stat.downloads for stat in stats])
+
+def _sum_downloads(stats: DownloadSeries) -> int:
+    return stats.sum()
 
 
 class NodePackage:
-    def __init__(self, author_name: str, package_name: str):
+    def __init__(self, author_name: str, package_name: str, history: HistoryStore = None, compact: bool = False):
+        # author_name may be empty for unscoped packages
         self.author_name = author_name
         self.package_name = package_name
+        self.history = history
+        # compact versions skip version manifests when reading the registry document
+        self.compact = compact
 
     @property
     def package_str(self) -> str:
-        return f"@{self.author_name}/{self.package_name}"
+        return _package_str(self.author_name, self.package_name)
 
     @property
     def versions(self) -> list[NodePackageVersion]:
-        data = _info_api_call(self.package_str)
-        versions = []
-        date_data = data['time']
-        for name, version_info in data["versions"].items():
-            date = date_data[name]
-            versions.append(NodePackageVersion(version_name=name, release_date=date, data=version_info))
-        return versions
+        if self.compact:
+            names, release_dates = _release_dates_api_call(self.package_str)
+            return _process_release_dates(self.package_str, names, release_dates)
+        return _process_versions(_info_api_call(self.package_str))
+
+    @property
+    def version_names(self) -> list[str]:
+        return list(_abbreviated_info_api_call(self.package_str).get('versions', {}))
 
     @property
     def latest_version(self) -> NodePackageVersion:
         versions = self.versions
         return versions[-1] if versions else None
 
-    def downloads_between(self, start_date: datetime, end_date: datetime) -> list[NodePackageDownloadStat]:
-        data = _stats_api_call(self.package_str, start_date, end_date)
-        return _process_download_stats(data['downloads'])
+    def downloads_between(self, start_date: datetime, end_date: datetime) -> DownloadSeries:
+        if self.history:
+            return self._stored_downloads_between(start_date, end_date)
+        rows = _fetch_download_rows([self.package_str], start_date, end_date)
+        return _process_download_stats(rows[self.package_str])
 
-    def downloads_since(self, date: datetime) -> list[NodePackageDownloadStat]:
+    def _stored_downloads_between(self, start_date: datetime, end_date: datetime) -> DownloadSeries:
+        # only the stored range is trusted, and only when every day in it is there
+        missing = self.history.missing_range(NPM, self.package_str, start_date=start_date, end_date=end_date)
+        if missing:
+            data = _fetch_download_rows([self.package_str], *missing)[self.package_str]
+            self.history.save(NPM, self.package_str, [(item['day'], item['downloads']) for item in data])
+        rows = self.history.load(NPM, self.package_str, start_date=start_date, end_date=end_date)
+        return DownloadSeries.from_pairs(rows, stat_type=NodePackageDownloadStat)
+
+    def downloads_since(self, date: datetime) -> DownloadSeries:
         return self.downloads_between(date, datetime.now())
 
     def downloads_on(self, date: datetime) -> NodePackageDownloadStat:
@@ -80,12 +252,12 @@ class NodePackage:
     @property
     def downloads_today(self) -> int:
         stats = self.downloads_on(datetime.now())
-        return _sum_downloads([stats]) if stats else 0
+        return stats.downloads if stats else 0
 
     @property
     def downloads_yesterday(self) -> int:
         stats = self.downloads_on(datetime.now() - timedelta(days=1))
-        return _sum_downloads([stats]) if stats else 0
+        return stats.downloads if stats else 0
 
     @property
     def downloads_last_week(self) -> int:
@@ -101,3 +273,10 @@ class NodePackage:
     def downloads_last_year(self) -> int:
         stats = self.downloads_since(datetime.now() - timedelta(days=365))
         return _sum_downloads(stats)
+
+
+def bulk_downloads_between(packages: list[NodePackage], start_date: datetime, end_date: datetime,
+                           max_workers: int = 8) -> dict[str, DownloadSeries]:
+    package_strs = list(dict.fromkeys(package.package_str for package in packages))
+    rows = _fetch_download_rows(package_strs, start_date, end_date, max_workers=max_workers)
+    return {package_str: _process_download_stats(data) for package_str, data in rows.items()}
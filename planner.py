@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+import PHP
+import csharp
+import node
+import python
+import ruby
+from metrics import bind_caller
+
+
+class Metric:
+    # A metric is derived from one named source. Range sources are fetched once, wide enough for the longest
+    # window any requested metric needs.
+    __slots__ = ('source', 'derive', 'days')
+
+    def __init__(self, source: str, derive: Callable, days: int = 0):
+        self.source = source
+        self.derive = derive
+        self.days = days
+
+
+def _npm_range(package: node.NodePackage, days: int, now: datetime):
+    return package.downloads_between(now - timedelta(days=days), now)
+
+
+def _npm_window(days: int) -> Metric:
+    return Metric('range', lambda package, series, now: series.since(now - timedelta(days=days)).sum(), days=days)
+
+
+def _pypi_daily_totals(package: python.PythonPackage, snapshot: python.PythonPackageSnapshot, now: datetime):
+    # the history path merges stored days that pepy no longer serves
+    return package.daily_downloads_totals if package.history else snapshot.daily_downloads_totals
+
+
+def _latest(series) -> int:
+    return int(series.counts[-1]) if len(series) else 0
+
+
+SOURCES = {
+    node.NodePackage: {
+        'range': _npm_range,
+    },
+    python.PythonPackage: {
+        'recent': lambda package, days, now: python._recent_stats(package_name=package.package_name),
+        'snapshot': lambda package, days, now: package.snapshot(),
+        'system': lambda package, days, now: python._system_stats(package_name=package.package_name),
+        'python_major': lambda package, days, now: python._python_major_stats(package_name=package.package_name),
+        'python_minor': lambda package, days, now: python._python_minor_stats(package_name=package.package_name),
+    },
+    PHP.PHPPackage: {
+        'info': lambda package, days, now: PHP._info_api_call(package_str=package._package_str).get('downloads'),
+        'daily': lambda package, days, now: package.daily_downloads,
+    },
+    csharp.NugetPackage: {
+        'version_stats': lambda package, days, now: csharp._version_api_call(package.package_name).get('Table'),
+        'info': lambda package, days, now: csharp._info_api_call(package.package_name),
+    },
+    ruby.RubyGem: {
+        endpoint: (lambda endpoint: lambda package, days, now: getattr(package, endpoint))(endpoint)
+        for endpoint in ('daily_downloads', 'total_downloads', 'daily_ranking', 'total_ranking')
+    },
+}
+
+METRICS = {
+    node.NodePackage: {
+        'downloads_today': Metric('range', lambda package, series, now: series.on(now)),
+        'downloads_yesterday': Metric('range', lambda package, series, now: series.on(now - timedelta(days=1)),
+                                      days=1),
+        'downloads_last_week': _npm_window(7),
+        'downloads_last_month': _npm_window(30),
+        'downloads_last_year': _npm_window(365),
+    },
+    python.PythonPackage: {
+        'downloads_yesterday': Metric('recent', lambda package, data, now: data.get('last_day', 0)),
+        'downloads_last_week': Metric('recent', lambda package, data, now: data.get('last_week', 0)),
+        'downloads_last_month': Metric('recent', lambda package, data, now: data.get('last_month', 0)),
+        'downloads_lifetime': Metric('snapshot', lambda package, snapshot, now: snapshot.downloads_lifetime),
+        'daily_downloads_totals': Metric('snapshot', _pypi_daily_totals),
+        'versions': Metric('snapshot', lambda package, snapshot, now: snapshot.versions),
+        'operating_system_breakdown': Metric('system', lambda package, data, now: python._process_breakdown(data)),
+        'python_major_breakdown': Metric('python_major', lambda package, data, now: python._process_breakdown(data)),
+        'python_minor_breakdown': Metric('python_minor', lambda package, data, now: python._process_breakdown(data)),
+    },
+    PHP.PHPPackage: {
+        'total_downloads_lifetime': Metric('info', lambda package, data, now: data.get('total')),
+        'average_daily_downloads_lifetime': Metric('info', lambda package, data, now: data.get('daily')),
+        'average_monthly_downloads_lifetime': Metric('info', lambda package, data, now: data.get('monthly')),
+        'daily_downloads': Metric('daily', lambda package, series, now: series),
+    },
+    csharp.NugetPackage: {
+        'recent_total_downloads': Metric('version_stats',
+                                         lambda package, data, now: csharp._sum_version_downloads(data)),
+        'versions': Metric('info', lambda package, data, now: csharp._process_versions(package.package_name, data)),
+    },
+    ruby.RubyGem: {
+        'daily_downloads': Metric('daily_downloads', lambda package, series, now: series),
+        'latest_daily_downloads': Metric('daily_downloads', lambda package, series, now: _latest(series)),
+        'total_downloads': Metric('total_downloads', lambda package, series, now: _latest(series)),
+        'daily_ranking': Metric('daily_ranking', lambda package, series, now: _latest(series)),
+        'total_ranking': Metric('total_ranking', lambda package, series, now: _latest(series)),
+    },
+}
+
+
+def _plan_type(package) -> type:
+    # subclasses of the client classes use their base's plan; the async clients are not subclasses and have none
+    for package_type in type(package).__mro__:
+        if package_type in METRICS:
+            return package_type
+    raise TypeError(f'No query plan for {type(package).__name__}')
+
+
+def _metrics_for(package) -> dict[str, Metric]:
+    return METRICS[_plan_type(package)]
+
+
+def available_metrics(package) -> list[str]:
+    return list(_metrics_for(package))
+
+
+def plan(package, metrics: list[str]) -> dict[str, int]:
+    # source name -> days it has to cover
+    known = _metrics_for(package)
+    unknown = [name for name in metrics if name not in known]
+    if unknown:
+        raise ValueError(f'Unknown metrics for {type(package).__name__}: {", ".join(unknown)}')
+    sources = {}
+    for name in metrics:
+        metric = known[name]
+        sources[metric.source] = max(sources.get(metric.source, 0), metric.days)
+    return sources
+
+
+def query(package, metrics: list[str], max_workers: int = 4) -> dict[str, Any]:
+    known = _metrics_for(package)
+    sources = plan(package, metrics)
+    fetchers = SOURCES[_plan_type(package)]
+    now = datetime.now()
+
+    def load(source: str):
+        return fetchers[source](package, sources[source], now)
+
+    if len(sources) == 1:
+        results = {source: load(source) for source in sources}
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as executor:
+            results = dict(zip(sources, executor.map(bind_caller(load), sources)))
+    return {name: known[name].derive(package, results[known[name].source], now) for name in metrics}
@@ -1,18 +1,27 @@
 from datetime import datetime
 
-import objectrest
+import fetch
+from history import HistoryStore, PYPI
+from metrics import instrument
+from series import CategoryBreakdown, DatedStat, DownloadSeries
 
 
-def _date_to_str(date: datetime) -> str:
-    return date.strftime('%Y-%m-%d')
+def _pepy_info_url(package_name: str) -> str:
+    return f'https://api.pepy.tech/api/v2/projects/{package_name}'
 
 
+def _pypi_stats_url(package_name: str, endpoint: str) -> str:
+    return f'https://pypistats.org/api/packages/{package_name}/{endpoint}'
+
+
+@instrument
 def _pepy_info_api_call(package_name: str) -> dict:
-    return objectrest.get_json(f'https://api.pepy.tech/api/v2/projects/{package_name}')
+    return fetch.get_json(_pepy_info_url(package_name=package_name))
 
 
+@instrument
 def _pypi_stats_info_api_call(package_name: str, endpoint: str, params: dict = None) -> dict:
-    return objectrest.get_json(f'https://pypistats.org/api/packages/{package_name}/{endpoint}', params=params)
+    return fetch.get_json(_pypi_stats_url(package_name=package_name, endpoint=endpoint), params=params)
 
 
 def _recent_stats(package_name: str, params: dict = None) -> dict:
@@ -35,53 +44,144 @@ def _system_stats(package_name: str, params: dict = None) -> dict:
     return _pypi_stats_info_api_call(package_name=package_name, endpoint='system', params=params).get('data')
 
 
-class PythonPackageDownloadStat:
+def _stat_rows(data) -> list[dict]:
+    # pypistats returns a list of rows; older payloads were keyed by index
+    if isinstance(data, dict):
+        return list(data.values())
+    return data or []
+
+
+def _sum_stat_rows(data) -> int:
+    total = 0
+    for info in _stat_rows(data):
+        total += info.get('downloads', 0)
+    return total
+
+
+class PythonPackageDownloadStat(DatedStat):
+    __slots__ = ('downloads',)
+
     def __init__(self, date: str, downloads: int):
-        self.date = date
+        super().__init__(date)
         self.downloads = downloads
 
 
+def _build_stats(dates: list[str], counts: list[int]) -> DownloadSeries:
+    return DownloadSeries(dates, counts, stat_type=PythonPackageDownloadStat)
+
+
+def _process_overall_stats(data) -> DownloadSeries:
+    return DownloadSeries.from_pairs(((info.get('date'), info.get('downloads', 0)) for info in _stat_rows(data)
+                                      if info.get('category') != 'with_mirrors'),
+                                     stat_type=PythonPackageDownloadStat)
+
+
+def _process_breakdown(data) -> CategoryBreakdown:
+    return CategoryBreakdown.from_rows(_stat_rows(data), category_key='category', date_key='date',
+                                       value_key='downloads', stat_type=PythonPackageDownloadStat)
+
+
+def _version_stats(data: dict, version_name: str) -> DownloadSeries:
+    return DownloadSeries.from_pairs(((date, downloads.get(version_name, 0)) for date, downloads in data.items()),
+                                     stat_type=PythonPackageDownloadStat)
+
+
 class PythonPackageVersion:
-    def __init__(self, version_name: str, downloads: int, package_name: str):
+    __slots__ = ('version_name', 'recent_downloads', '_package_name', '_snapshot')
+
+    def __init__(self, version_name: str, downloads: int, package_name: str, snapshot: 'PythonPackageSnapshot' = None):
         self.version_name = version_name
         self.recent_downloads = downloads
         self._package_name = package_name
+        self._snapshot = snapshot
 
     @property
-    def daily_downloads(self) -> list[PythonPackageDownloadStat]:
+    def daily_downloads(self) -> DownloadSeries:
+        if self._snapshot:
+            return self._snapshot.daily_downloads_for_version(version_name=self.version_name)
         data = _pepy_info_api_call(package_name=self._package_name).get('downloads')
-        stats = []
-        for date, downloads in data.items():
-            total = downloads.get(self.version_name, 0)
-            stats.append(PythonPackageDownloadStat(date=date, downloads=total))
-        return stats
+        return _version_stats(data=data, version_name=self.version_name)
+
+
+class PythonPackageSnapshot:
+    def __init__(self, package_name: str, data: dict):
+        self.package_name = package_name
+        self.downloads_lifetime = data.get('total_downloads', 0)
+        self.version_names = list(data.get('versions') or [])
+        self.dates = []
+        self.totals = []
+        self.version_totals = {name: 0 for name in self.version_names}
+        self._version_counts = {}
+
+        # single pass over the pepy document: per-day totals, per-version totals and per-version daily counts
+        downloads = data.get('downloads') or {}
+        day_count = len(downloads)
+        version_counts = self._version_counts
+        version_totals = self.version_totals
+        for i, (date, day) in enumerate(downloads.items()):
+            self.dates.append(date)
+            self.totals.append(sum(day.values()))
+            for version_name, count in day.items():
+                counts = version_counts.get(version_name)
+                if counts is None:
+                    counts = version_counts[version_name] = [0] * day_count
+                counts[i] = count
+                version_totals[version_name] = version_totals.get(version_name, 0) + count
+
+    @property
+    def versions(self) -> list[PythonPackageVersion]:
+        return [PythonPackageVersion(version_name=name, downloads=self.version_totals.get(name, 0),
+                                     package_name=self.package_name, snapshot=self)
+                for name in self.version_names]
+
+    @property
+    def daily_downloads_totals(self) -> DownloadSeries:
+        return _build_stats(dates=self.dates, counts=self.totals)
+
+    def daily_downloads_for_version(self, version_name: str) -> DownloadSeries:
+        counts = self._version_counts.get(version_name) or [0] * len(self.dates)
+        return _build_stats(dates=self.dates, counts=counts)
+
+    def recent_total_downloads_for_version(self, version_name: str) -> int:
+        return self.version_totals.get(version_name, 0)
 
 
 class PythonPackage:
-    def __init__(self, package_name: str):
+    def __init__(self, package_name: str, history: HistoryStore = None):
         self.package_name = package_name
+        self.history = history
+        # last overall payload seen and the series indexed from it
+        self._overall = (None, None)
 
     @property
     def downloads_lifetime(self) -> int:
         return _pepy_info_api_call(package_name=self.package_name).get('total_downloads', 0)
 
+    def snapshot(self) -> PythonPackageSnapshot:
+        return PythonPackageSnapshot(package_name=self.package_name,
+                                     data=_pepy_info_api_call(package_name=self.package_name))
+
     @property
     def versions(self) -> list[PythonPackageVersion]:
-        data = _pepy_info_api_call(package_name=self.package_name).get('versions')
-        versions = []
-        for version_name in data.keys():
-            downloads = self.recent_total_downloads_for_version(version_name=version_name)
-            versions.append(
-                PythonPackageVersion(version_name=version_name, downloads=downloads, package_name=self.package_name))
-        return versions
+        return self.snapshot().versions
 
-    def downloads_on(self, date: datetime) -> int:
-        date_str = _date_to_str(date=date)
+    def _overall_series(self) -> DownloadSeries:
+        # the response cache hands back the same payload while it is fresh, so it is only indexed once
         data = _overall_stats(package_name=self.package_name, params={'mirrors': False})
-        for _, info in data.items():
-            if info.get('date') == date_str:
-                return info.get('downloads')
-        return 0
+        indexed_data, series = self._overall
+        if indexed_data is not data:
+            series = _process_overall_stats(data=data)
+            self._overall = (data, series)
+        return series
+
+    def downloads_on(self, date: datetime) -> int:
+        return self._overall_series().on(date)
+
+    def downloads_between(self, start_date: datetime, end_date: datetime) -> DownloadSeries:
+        return self._overall_series().between(start_date, end_date)
+
+    def downloads_since(self, date: datetime) -> DownloadSeries:
+        return self._overall_series().since(date)
 
     @property
     def downloads_yesterday(self) -> int:
@@ -96,21 +196,20 @@ class PythonPackage:
         return _recent_stats(package_name=self.package_name).get('last_month', 0)
 
     @property
-    def daily_downloads_totals(self) -> list[PythonPackageDownloadStat]:
+    def daily_downloads_totals(self) -> DownloadSeries:
+        if self.history:
+            # pepy only serves a recent window, so the store also keeps days pepy no longer returns
+            snapshot = self.snapshot()
+            self.history.merge(PYPI, self.package_name, zip(snapshot.dates, snapshot.totals))
+            rows = self.history.load(PYPI, self.package_name)
+            return DownloadSeries.from_pairs(rows, stat_type=PythonPackageDownloadStat)
         data = _pepy_info_api_call(package_name=self.package_name).get('downloads')
-        stats = []
-        for date, downloads in data.items():
-            total = sum(downloads.values())
-            stats.append(PythonPackageDownloadStat(date=date, downloads=total))
-        return stats
+        return DownloadSeries.from_pairs(((date, sum(downloads.values())) for date, downloads in data.items()),
+                                         stat_type=PythonPackageDownloadStat)
 
-    def daily_downloads_for_version(self, version_name: str) -> list[PythonPackageDownloadStat]:
+    def daily_downloads_for_version(self, version_name: str) -> DownloadSeries:
         data = _pepy_info_api_call(package_name=self.package_name).get('downloads')
-        stats = []
-        for date, downloads in data.items():
-            total = downloads.get(version_name, 0)
-            stats.append(PythonPackageDownloadStat(date=date, downloads=total))
-        return stats
+        return _version_stats(data=data, version_name=version_name)
 
     def recent_total_downloads_for_version(self, version_name: str) -> int:
         data = _pepy_info_api_call(package_name=self.package_name).get('downloads')
@@ -121,14 +220,22 @@ class PythonPackage:
 
     def recent_total_downloads_by_operating_system(self, operating_system: str) -> int:
         data = _system_stats(package_name=self.package_name, params={'os': operating_system})
-        total = 0
-        for _, info in data.items():
-            total += info.get('downloads', 0)
-        return total
+        return _sum_stat_rows(data=data)
 
     def recent_total_downloads_by_python_version(self, python_version: str) -> int:
         data = _python_minor_stats(package_name=self.package_name, params={'version': python_version})
-        total = 0
-        for _, info in data.items():
-            total += info.get('downloads', 0)
-        return total
+        return _sum_stat_rows(data=data)
+
+    # full breakdowns fetch each endpoint once, unfiltered, and group every category at once
+
+    @property
+    def operating_system_breakdown(self) -> CategoryBreakdown:
+        return _process_breakdown(data=_system_stats(package_name=self.package_name))
+
+    @property
+    def python_major_breakdown(self) -> CategoryBreakdown:
+        return _process_breakdown(data=_python_major_stats(package_name=self.package_name))
+
+    @property
+    def python_minor_breakdown(self) -> CategoryBreakdown:
+        return _process_breakdown(data=_python_minor_stats(package_name=self.package_name))
@@ -0,0 +1,217 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from PHP import PHPPackage
+from csharp import NugetPackage
+from node import NodePackage
+from python import PythonPackage
+from ruby import RubyGem
+from series import DownloadSeries
+
+FIELDS = ('ecosystem', 'package', 'metric', 'date', 'value')
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+
+class ManifestEntry:
+    def __init__(self, ecosystem: str, name: str, author: str = None):
+        self.ecosystem = ecosystem.lower()
+        self.name = name
+        # packagist vendor or npm scope
+        self.author = author or None
+
+    @property
+    def label(self) -> str:
+        if self.ecosystem == 'npm' and self.author:
+            return f'@{self.author}/{self.name}'
+        if self.author:
+            return f'{self.author}/{self.name}'
+        return self.name
+
+
+def read_manifest(path: str) -> list[ManifestEntry]:
+    # JSON: [{"ecosystem": "npm", "author": "babel", "name": "core"}, ...]; CSV: ecosystem,author,name
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(file))
+        else:
+            rows = json.load(file)
+    return [ManifestEntry(ecosystem=row['ecosystem'], name=row['name'], author=row.get('author') or row.get('scope'))
+            for row in rows]
+
+
+def _series_rows(entry: ManifestEntry, metric: str, series: DownloadSeries) -> list[dict]:
+    return [{'ecosystem': entry.ecosystem, 'package': entry.label, 'metric': metric, 'date': date, 'value': value}
+            for date, value in zip(series.dates.astype(str).tolist(), series.counts.tolist())]
+
+
+def _last_days(series: DownloadSeries, days: int) -> DownloadSeries:
+    # not series[-days:], which is the whole series for days=0
+    return series[max(len(series) - max(days, 0), 0):]
+
+
+def _headline_rows(entry: ManifestEntry, values: dict) -> list[dict]:
+    return [{'ecosystem': entry.ecosystem, 'package': entry.label, 'metric': metric, 'date': '', 'value': value}
+            for metric, value in values.items()]
+
+
+def _collect_pypi(entry: ManifestEntry, days: int) -> list[dict]:
+    package = PythonPackage(entry.name)
+    headline = {
+        'downloads_lifetime': package.downloads_lifetime,
+        'downloads_yesterday': package.downloads_yesterday,
+        'downloads_last_week': package.downloads_last_week,
+        'downloads_last_month': package.downloads_last_month,
+    }
+    daily = package.daily_downloads_totals
+    return _headline_rows(entry, headline) + _series_rows(entry, 'daily_downloads', _last_days(daily, days))
+
+
+def _collect_npm(entry: ManifestEntry, days: int) -> list[dict]:
+    package = NodePackage(entry.author, entry.name)
+    today = datetime.now()
+    # one year-long series answers every headline window
+    year = package.downloads_between(today - timedelta(days=max(days, 365)), today)
+    headline = {
+        'downloads_yesterday': year.on(today - timedelta(days=1)),
+        'downloads_last_week': year.since(today - timedelta(days=7)).sum(),
+        'downloads_last_month': year.since(today - timedelta(days=30)).sum(),
+        'downloads_last_year': year.since(today - timedelta(days=365)).sum(),
+    }
+    return _headline_rows(entry, headline) + _series_rows(entry, 'daily_downloads', _last_days(year, days))
+
+
+def _collect_packagist(entry: ManifestEntry, days: int) -> list[dict]:
+    package = PHPPackage(entry.author, entry.name)
+    headline = {
+        'total_downloads_lifetime': package.total_downloads_lifetime,
+        'average_daily_downloads_lifetime': package.average_daily_downloads_lifetime,
+        'average_monthly_downloads_lifetime': package.average_monthly_downloads_lifetime,
+    }
+    daily = package.daily_downloads
+    return _headline_rows(entry, headline) + _series_rows(entry, 'daily_downloads', _last_days(daily, days))
+
+
+def _collect_nuget(entry: ManifestEntry, days: int) -> list[dict]:
+    package = NugetPackage(entry.name)
+    return _headline_rows(entry, {'recent_total_downloads': package.recent_total_downloads})
+
+
+def _collect_rubygems(entry: ManifestEntry, days: int) -> list[dict]:
+    gem = RubyGem(entry.name)
+    daily = gem.daily_downloads
+    total = gem.total_downloads
+    ranking = gem.total_ranking
+    headline = {
+        'total_downloads': int(total.counts[-1]) if len(total) else 0,
+        'total_ranking': int(ranking.counts[-1]) if len(ranking) else 0,
+    }
+    return _headline_rows(entry, headline) + _series_rows(entry, 'daily_downloads', _last_days(daily, days))
+
+
+COLLECTORS = {
+    'pypi': _collect_pypi,
+    'npm': _collect_npm,
+    'packagist': _collect_packagist,
+    'nuget': _collect_nuget,
+    'rubygems': _collect_rubygems,
+}
+
+
+def collect(entries: list[ManifestEntry], days: int = 30, max_workers: int = 8) -> tuple[list[dict], list[str]]:
+    def run(entry: ManifestEntry) -> tuple[list[dict], str]:
+        collector = COLLECTORS.get(entry.ecosystem)
+        if collector is None:
+            return [], f'{entry.ecosystem}:{entry.label}: unknown ecosystem'
+        try:
+            return collector(entry, days), None
+        except Exception as e:
+            return [], f'{entry.ecosystem}:{entry.label}: {type(e).__name__}: {e}'
+
+    rows = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for entry_rows, error in executor.map(run, entries):
+            rows.extend(entry_rows)
+            if error:
+                errors.append(error)
+    return rows, errors
+
+
+def _row_key(row: dict) -> str:
+    return '|'.join(str(row[field]) for field in FIELDS[:-1])
+
+
+def changed_rows(rows: list[dict], state_path: str) -> list[dict]:
+    # keeps only rows whose value differs from the last run recorded in state_path, then updates it
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as file:
+            state = json.load(file)
+    changed = [row for row in rows if state.get(_row_key(row)) != row['value']]
+    state.update((_row_key(row), row['value']) for row in rows)
+    with open(state_path, 'w') as file:
+        json.dump(state, file)
+    return changed
+
+
+def write_rows(rows: list[dict], output_format: str, file_path: str = None):
+    if output_format == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit('Parquet output needs pyarrow installed')
+        if not file_path:
+            raise SystemExit('Parquet output needs --output')
+        table = pyarrow.table({field: [row[field] for row in rows] for field in FIELDS})
+        pyarrow.parquet.write_table(table, file_path)
+        return
+
+    file = open(file_path, 'w', newline='') if file_path else sys.stdout
+    try:
+        if output_format == 'csv':
+            writer = csv.DictWriter(file, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                file.write(json.dumps(row) + '\n')
+    finally:
+        if file_path:
+            file.close()
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f'expected a number of at least 0, got {value}')
+    return number
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Collect download stats for a portfolio of packages')
+    parser.add_argument('manifest', help='JSON or CSV manifest of packages (ecosystem, author, name)')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--output', help='output file; defaults to stdout for csv and jsonl')
+    parser.add_argument('--days', type=non_negative_int, default=30,
+                        help='days of daily downloads per package; 0 for headline numbers only')
+    parser.add_argument('--concurrency', type=int, default=8, help='packages collected at once')
+    parser.add_argument('--state', help='only emit rows that changed since the last run recorded in this file')
+    args = parser.parse_args(argv)
+
+    rows, errors = collect(read_manifest(args.manifest), days=args.days, max_workers=args.concurrency)
+    if args.state:
+        rows = changed_rows(rows, args.state)
+    write_rows(rows, output_format=args.format, file_path=args.output)
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
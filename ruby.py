@@ -1,56 +1,169 @@
-import objectrest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
+import numpy as np
+
+import fetch
+from history import HistoryStore, RUBYGEMS
+from metrics import bind_caller, instrument
+from series import DatedStat, DownloadSeries
+
+
+class RubyGemDownloadStat(DatedStat):
+    __slots__ = ('downloads',)
 
-class RubyGemDownloadStat:
     def __init__(self, date: str, downloads: int):
-        self.date = date
+        super().__init__(date)
         self.downloads = downloads
 
 
-class RubyGemRankingStat:
+class RubyGemRankingStat(DatedStat):
+    __slots__ = ('rank',)
+
     def __init__(self, date: str, rank: int):
-        self.date = date
+        super().__init__(date)
         self.rank = rank
 
 
+def _api_url(gem_name: str, endpoint: str) -> str:
+    return f"https://bestgems.org/api/v1/gems/{gem_name}/{endpoint}.json"
+
+
+@instrument
 def _api_call(gem_name: str, endpoint: str):
-    return objectrest.get_json(f"https://bestgems.org/api/v1/gems/{gem_name}/{endpoint}.json")
+    return fetch.get_json(_api_url(gem_name=gem_name, endpoint=endpoint))
+
+
+def _process_download_stats(data: list) -> DownloadSeries:
+    return DownloadSeries.from_rows(data, date_key='date', value_key='total_downloads', stat_type=RubyGemDownloadStat)
 
 
-def _process_download_stats(data: dict) -> list[RubyGemDownloadStat]:
-    stats = []
-    for item in data:
-        stats.append(RubyGemDownloadStat(date=item['date'], downloads=item['total_downloads']))
-    return stats
+def _process_ranking_stats(data: list) -> DownloadSeries:
+    return DownloadSeries.from_rows(data, date_key='date', value_key='total_ranking', stat_type=RubyGemRankingStat,
+                                    value_name='rank')
 
 
-def _process_ranking_stats(data: dict) -> list[RubyGemRankingStat]:
-    stats = []
-    for item in data:
-        stats.append(RubyGemRankingStat(date=item['date'], rank=item['total_ranking']))
-    return stats
+def _derive_daily_downloads(total_downloads: DownloadSeries) -> DownloadSeries:
+    # day-over-day differences of the cumulative total; a gap in the data folds into its next day,
+    # and corrections that lower the total are clipped rather than reported as negative downloads
+    daily = total_downloads.diff()
+    return DownloadSeries(daily.dates, np.maximum(daily.counts, 0), stat_type=RubyGemDownloadStat)
+
+
+class RubyGemSnapshot:
+    def __init__(self, gem_name: str, total_downloads: DownloadSeries, daily_ranking: DownloadSeries = None,
+                 total_ranking: DownloadSeries = None, daily_downloads: DownloadSeries = None):
+        self.gem_name = gem_name
+        self.total_downloads = total_downloads
+        self.daily_ranking = daily_ranking
+        self.total_ranking = total_ranking
+        self.daily_downloads = daily_downloads if daily_downloads is not None \
+            else _derive_daily_downloads(total_downloads)
+
+    @property
+    def latest_date(self):
+        return self.total_downloads[-1].date if len(self.total_downloads) else None
+
+    def downloads_between(self, start_date: datetime, end_date: datetime) -> int:
+        # two lookups into the cumulative series instead of summing the days in between
+        total = self.total_downloads
+        if not len(total):
+            return 0
+        baseline = total.as_of(start_date - timedelta(days=1), default=int(total.counts[0]))
+        return max(total.as_of(end_date, default=baseline) - baseline, 0)
+
+    def downloads_last(self, days: int, end_date: datetime = None) -> int:
+        end_date = end_date or datetime.now()
+        return self.downloads_between(end_date - timedelta(days=days - 1), end_date)
+
+    def rolling_downloads(self, window: int) -> DownloadSeries:
+        return self.daily_downloads.rolling(window)
+
+    def average_daily_downloads(self, window: int) -> np.ndarray:
+        return self.daily_downloads.rolling_mean(window)
+
+    def _ranking(self, kind: str) -> DownloadSeries:
+        if kind not in ('daily', 'total'):
+            raise ValueError(f"Unsupported ranking: {kind}")
+        ranking = self.daily_ranking if kind == 'daily' else self.total_ranking
+        if ranking is None:
+            raise ValueError(f"Snapshot was taken without the {kind} ranking")
+        return ranking
+
+    def rank_on(self, date: datetime, kind: str = 'total') -> int:
+        return self._ranking(kind).as_of(date, default=None)
+
+    def rank_change(self, start_date: datetime, end_date: datetime, kind: str = 'total') -> int:
+        # positive when the gem climbed, i.e. its rank number went down
+        ranking = self._ranking(kind)
+        if not len(ranking):
+            return 0
+        start = ranking.as_of(start_date, default=int(ranking.counts[0]))
+        return start - ranking.as_of(end_date, default=start)
+
+    def rank_changes(self, kind: str = 'total') -> DownloadSeries:
+        changes = self._ranking(kind).diff()
+        return DownloadSeries(changes.dates, -changes.counts, stat_type=RubyGemRankingStat, value_name='rank')
+
+    def best_rank(self, start_date: datetime = None, end_date: datetime = None, kind: str = 'total') -> int:
+        ranking = self._ranking(kind)
+        if not len(ranking):
+            return None
+        if start_date or end_date:
+            ranking = ranking.between(start_date or ranking.dates[0], end_date or ranking.dates[-1])
+        return int(ranking.counts.min()) if len(ranking) else None
+
+
+def _build_snapshot(gem_name: str, data: dict) -> RubyGemSnapshot:
+    ranking = {endpoint: _process_ranking_stats(data[endpoint]) if endpoint in data else None
+               for endpoint in ('daily_ranking', 'total_ranking')}
+    return RubyGemSnapshot(gem_name=gem_name, total_downloads=_process_download_stats(data['total_downloads']),
+                           daily_ranking=ranking['daily_ranking'], total_ranking=ranking['total_ranking'],
+                           daily_downloads=_process_download_stats(data['daily_downloads'])
+                           if 'daily_downloads' in data else None)
 
 
 class RubyGem:
-    def __init__(self, gem_name: str):
+    def __init__(self, gem_name: str, history: HistoryStore = None):
         self.gem_name = gem_name
+        self.history = history
 
     @property
-    def daily_downloads(self):
+    def daily_downloads(self) -> DownloadSeries:
         data = _api_call(gem_name=self.gem_name, endpoint="daily_downloads")
-        return _process_download_stats(data)
+        stats = _process_download_stats(data)
+        if self.history:
+            # bestgems has no range parameter, so only the new days are written
+            self.history.merge(RUBYGEMS, self.gem_name, [(stat.date, stat.downloads) for stat in stats])
+            rows = self.history.load(RUBYGEMS, self.gem_name)
+            return DownloadSeries.from_pairs(rows, stat_type=RubyGemDownloadStat)
+        return stats
 
     @property
-    def total_downloads(self):
+    def total_downloads(self) -> DownloadSeries:
         data = _api_call(gem_name=self.gem_name, endpoint="total_downloads")
         return _process_download_stats(data)
 
     @property
-    def daily_ranking(self):
+    def daily_ranking(self) -> DownloadSeries:
         data = _api_call(gem_name=self.gem_name, endpoint="daily_ranking")
         return _process_ranking_stats(data)
 
     @property
-    def total_ranking(self):
+    def total_ranking(self) -> DownloadSeries:
         data = _api_call(gem_name=self.gem_name, endpoint="total_ranking")
         return _process_ranking_stats(data)
+
+    def snapshot(self, rankings: bool = True, fetch_daily_downloads: bool = False) -> RubyGemSnapshot:
+        # bestgems is slow, so the endpoints are fetched side by side; daily downloads are derived from the
+        # cumulative totals unless asked for explicitly
+        endpoints = ['total_downloads']
+        if rankings:
+            endpoints += ['daily_ranking', 'total_ranking']
+        if fetch_daily_downloads:
+            endpoints.append('daily_downloads')
+        with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+            futures = {endpoint: executor.submit(bind_caller(_api_call), self.gem_name, endpoint)
+                       for endpoint in endpoints}
+            data = {endpoint: future.result() for endpoint, future in futures.items()}
+        return _build_snapshot(self.gem_name, data)
@@ -0,0 +1,215 @@
+from datetime import date as Date, datetime
+from typing import Iterable, Union
+
+import numpy as np
+
+_DAY = 'datetime64[D]'
+_EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+
+def to_ordinal(date: Union[str, int]) -> int:
+    if isinstance(date, int):
+        return date
+    # monthly labels ("2024-01") stand for the first day of the month
+    return Date.fromisoformat(date[:10] if len(date) > 7 else f'{date}-01').toordinal()
+
+
+def from_ordinal(ordinal: int) -> str:
+    return Date.fromordinal(ordinal).isoformat()
+
+
+class DatedStat:
+    # Base for the per-module stat classes: the date is held as a day ordinal and rendered on access.
+    __slots__ = ('ordinal',)
+
+    def __init__(self, date: Union[str, int]):
+        self.ordinal = to_ordinal(date)
+
+    @property
+    def date(self) -> str:
+        return from_ordinal(self.ordinal)
+
+
+def _to_day(date: Union[datetime, str, np.datetime64]) -> np.datetime64:
+    if isinstance(date, datetime):
+        date = date.date()
+    return np.datetime64(date, 'D')
+
+
+def _week_starts(dates: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; shift every day back to the Monday of its week
+    days = dates.astype(np.int64)
+    return (days - (days + 3) % 7).astype(_DAY)
+
+
+class DownloadSeries:
+    __slots__ = ('dates', 'counts', 'stat_type', 'value_name')
+
+    def __init__(self, dates, counts, stat_type: type = None, value_name: str = 'downloads'):
+        self.dates = np.asarray(dates, dtype=_DAY)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        if len(self.dates) > 1 and (self.dates[1:] < self.dates[:-1]).any():
+            order = np.argsort(self.dates, kind='stable')
+            self.dates = self.dates[order]
+            self.counts = self.counts[order]
+        self.stat_type = stat_type
+        self.value_name = value_name
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[str, int]], stat_type: type = None,
+                   value_name: str = 'downloads') -> 'DownloadSeries':
+        dates = []
+        counts = []
+        for date, count in pairs:
+            dates.append(date[:10])
+            counts.append(count or 0)
+        return cls(dates, counts, stat_type=stat_type, value_name=value_name)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict], date_key: str, value_key: str, stat_type: type = None,
+                  value_name: str = 'downloads') -> 'DownloadSeries':
+        return cls.from_pairs(((row[date_key], row[value_key]) for row in rows), stat_type=stat_type,
+                              value_name=value_name)
+
+    def _like(self, dates, counts) -> 'DownloadSeries':
+        return DownloadSeries(dates, counts, stat_type=self.stat_type, value_name=self.value_name)
+
+    def _stat(self, ordinal: int, count: int):
+        if self.stat_type is None:
+            return from_ordinal(ordinal), count
+        return self.stat_type(ordinal, count)
+
+    def ordinals(self) -> np.ndarray:
+        return self.dates.astype(np.int64) + _EPOCH_ORDINAL
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __iter__(self):
+        for ordinal, count in zip(self.ordinals().tolist(), self.counts.tolist()):
+            yield self._stat(ordinal, count)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._like(self.dates[item], self.counts[item])
+        return self._stat(int(self.dates[item].astype(np.int64)) + _EPOCH_ORDINAL, int(self.counts[item]))
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return 'DownloadSeries([])'
+        return f'DownloadSeries({self.dates[0]}..{self.dates[-1]}, {len(self)} days)'
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def sum(self) -> int:
+        return int(self.counts.sum())
+
+    def mean(self) -> float:
+        return float(self.counts.mean()) if len(self) else 0.0
+
+    def between(self, start_date, end_date) -> 'DownloadSeries':
+        # dates are kept in ascending order, so both ends are a binary search
+        start = np.searchsorted(self.dates, _to_day(start_date), side='left')
+        end = np.searchsorted(self.dates, _to_day(end_date), side='right')
+        return self[start:end]
+
+    def since(self, date) -> 'DownloadSeries':
+        return self[np.searchsorted(self.dates, _to_day(date), side='left'):]
+
+    def on(self, date) -> int:
+        day = _to_day(date)
+        index = np.searchsorted(self.dates, day)
+        if index < len(self) and self.dates[index] == day:
+            return int(self.counts[index])
+        return 0
+
+    def as_of(self, date, default: int = 0) -> int:
+        # the latest value on or before date, for cumulative series and rankings
+        index = np.searchsorted(self.dates, _to_day(date), side='right') - 1
+        return int(self.counts[index]) if index >= 0 else default
+
+    def rolling(self, window: int) -> 'DownloadSeries':
+        # trailing-window sums, labelled by the last day of each window
+        if window <= 0 or window > len(self):
+            return self._like([], [])
+        cumulative = np.concatenate(([0], np.cumsum(self.counts)))
+        return self._like(self.dates[window - 1:], cumulative[window:] - cumulative[:-window])
+
+    def rolling_mean(self, window: int) -> np.ndarray:
+        return self.rolling(window).counts / window
+
+    def resample(self, period: str = 'W') -> 'DownloadSeries':
+        if period == 'W':
+            buckets = _week_starts(self.dates)
+        elif period in ('M', 'Y'):
+            buckets = self.dates.astype(f'datetime64[{period}]').astype(_DAY)
+        else:
+            raise ValueError(f"Unsupported period: {period}")
+        if not len(self):
+            return self._like([], [])
+        labels, starts = np.unique(buckets, return_index=True)
+        return self._like(labels, np.add.reduceat(self.counts, starts))
+
+    def diff(self) -> 'DownloadSeries':
+        return self._like(self.dates[1:], np.diff(self.counts))
+
+
+class CategoryBreakdown:
+    # Daily counts for several categories over one shared, sorted date axis: counts[category index, date index].
+    __slots__ = ('categories', 'dates', 'counts', 'stat_type', 'value_name')
+
+    def __init__(self, categories, dates, counts, stat_type: type = None, value_name: str = 'downloads'):
+        self.categories = list(categories)
+        self.dates = np.asarray(dates, dtype=_DAY)
+        self.counts = np.asarray(counts, dtype=np.int64).reshape(len(self.categories), len(self.dates))
+        self.stat_type = stat_type
+        self.value_name = value_name
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict], category_key: str, date_key: str, value_key: str,
+                  stat_type: type = None, value_name: str = 'downloads') -> 'CategoryBreakdown':
+        categories = []
+        dates = []
+        counts = []
+        for row in rows:
+            categories.append(str(row[category_key]))
+            dates.append(row[date_key][:10])
+            counts.append(row[value_key] or 0)
+        # group by (category, date) in one scatter-add over the flattened matrix
+        category_labels, category_index = np.unique(np.asarray(categories, dtype=str), return_inverse=True)
+        date_labels, date_index = np.unique(np.asarray(dates, dtype=_DAY), return_inverse=True)
+        matrix = np.zeros(len(category_labels) * len(date_labels), dtype=np.int64)
+        np.add.at(matrix, category_index * len(date_labels) + date_index, np.asarray(counts, dtype=np.int64))
+        return cls(category_labels.tolist(), date_labels, matrix, stat_type=stat_type, value_name=value_name)
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.categories
+
+    def __repr__(self) -> str:
+        return f'CategoryBreakdown({len(self.categories)} categories, {len(self.dates)} days)'
+
+    @property
+    def totals(self) -> dict[str, int]:
+        return dict(zip(self.categories, self.counts.sum(axis=1).tolist()))
+
+    @property
+    def daily_totals(self) -> DownloadSeries:
+        return DownloadSeries(self.dates, self.counts.sum(axis=0), stat_type=self.stat_type,
+                              value_name=self.value_name)
+
+    def series(self, category: str) -> DownloadSeries:
+        if category not in self.categories:
+            return DownloadSeries([], [], stat_type=self.stat_type, value_name=self.value_name)
+        return DownloadSeries(self.dates, self.counts[self.categories.index(category)], stat_type=self.stat_type,
+                              value_name=self.value_name)
+
+    def to_dict(self) -> dict[str, DownloadSeries]:
+        return {category: self.series(category) for category in self.categories}
+
+    def shares(self) -> dict[str, float]:
+        total = int(self.counts.sum())
+        return {category: (count / total if total else 0.0) for category, count in self.totals.items()}
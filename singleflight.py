@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls for the same key share a single execution of the first caller's function.
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> tuple[Any, bool]:
+        # returns (result, shared); shared is True when another caller's execution was reused
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
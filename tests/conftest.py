@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fetch  # noqa: E402
+from benchmarks.replay import ReplayServer, ReplayTransport  # noqa: E402
+
+
+@pytest.fixture
+def replay():
+    # every fetch goes to a local replay server with synthetic payloads and an empty response cache
+    with ReplayServer() as server:
+        previous = fetch.set_transport(ReplayTransport(server.base_url))
+        fetch.clear_cache()
+        try:
+            yield server
+        finally:
+            fetch.set_transport(previous)
+            fetch.clear_cache()
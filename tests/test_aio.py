@@ -0,0 +1,197 @@
+import asyncio
+import inspect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import warnings
+from urllib.parse import urlsplit
+
+import pytest
+
+import PHP
+import aio
+import csharp
+import fetch
+import metrics
+import node
+import planner
+import python
+import ruby
+from benchmarks.fixtures import SyntheticFixtures
+from transport import Transport
+
+
+class _FixtureSession:
+    # answers AsyncSession.get_json from the synthetic fixtures without any network
+    def __init__(self):
+        self.fixtures = SyntheticFixtures()
+        self.urls = []
+
+    async def get_json(self, url: str, params: dict = None, headers: dict = None):
+        self.urls.append(url)
+        parts = urlsplit(url)
+        return self.fixtures.payload(parts.hostname, parts.path, parts.query)
+
+
+def test_async_php_version_stats_awaits_every_series():
+    session = _FixtureSession()
+    package = aio.AsyncPHPPackage('laravel', 'framework', session=session)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        stats = asyncio.run(package.version_stats(intervals=('daily', 'weekly'), versions=['1.0.0', '1.1.0']))
+
+    assert set(stats) == {'1.0.0', '1.1.0'}
+    assert all(len(series) for intervals in stats.values() for series in intervals.values())
+    assert len(session.urls) == 4
+
+
+class _NoSyncRequests:
+    # fails any blocking fetch made from inside the event loop
+    def get_json(self, url: str, params: dict = None):
+        raise AssertionError(f'blocking request for {url}')
+
+
+def _assert_async_methods(owner):
+    for name in dir(type(owner)):
+        attribute = getattr(type(owner), name)
+        if not name.startswith('_') and callable(attribute):
+            assert asyncio.iscoroutinefunction(attribute), f'{type(owner).__name__}.{name} is not async'
+
+
+def _no_argument_methods(client) -> list[str]:
+    return [name for name in dir(type(client)) if not name.startswith('_')
+            and callable(getattr(type(client), name))
+            and all(parameter.default is not inspect.Parameter.empty
+                    for parameter in list(inspect.signature(getattr(type(client), name)).parameters.values())[1:])]
+
+
+def test_async_clients_expose_only_coroutines(monkeypatch):
+    session = _FixtureSession()
+    clients = [aio.AsyncPythonPackage('requests', session), aio.AsyncPHPPackage('laravel', 'framework', session),
+               aio.AsyncNodePackage('', 'react', session), aio.AsyncNugetPackage('Newtonsoft.Json', session),
+               aio.AsyncRubyGem('rails', session)]
+    sync_bases = (python.PythonPackage, PHP.PHPPackage, node.NodePackage, csharp.NugetPackage, ruby.RubyGem)
+    monkeypatch.setattr(fetch, 'transport', _NoSyncRequests())
+    monkeypatch.setattr(fetch, 'response_cache', fetch.ResponseCache())
+
+    async def results(client) -> list:
+        # version_stats asks for every version's series; test_async_php_version_stats_awaits_every_series covers it
+        return await asyncio.gather(*(getattr(client, name)() for name in _no_argument_methods(client)
+                                      if name != 'version_stats'))
+
+    for client in clients:
+        assert not isinstance(client, sync_bases)
+        _assert_async_methods(client)
+        # what the coroutines return must not fetch anything either, e.g. through lazy properties
+        for result in asyncio.run(results(client)):
+            for item in result if isinstance(result, list) else [result]:
+                if type(item).__module__ in ('aio', 'PHP', 'node', 'python', 'csharp', 'ruby'):
+                    for name in dir(item):
+                        if not name.startswith('_'):
+                            getattr(item, name)
+                if type(item).__module__ == 'aio':
+                    _assert_async_methods(item)
+
+
+def test_async_clients_answer_from_fixtures():
+    session = _FixtureSession()
+
+    async def run():
+        node_package = aio.AsyncNodePackage('', 'react', session)
+        python_package = aio.AsyncPythonPackage('requests', session)
+        gem = aio.AsyncRubyGem('rails', session)
+        nuget = aio.AsyncNugetPackage('Newtonsoft.Json', session)
+        php = aio.AsyncPHPPackage('laravel', 'framework', session)
+        return (await node_package.version_names(), await node_package.downloads_last_week(),
+                await python_package.downloads_lifetime(), await python_package.python_minor_breakdown(),
+                await gem.snapshot(), await nuget.detailed_versions(), await php.latest_version())
+
+    version_names, last_week, lifetime, breakdown, snapshot, versions, latest = asyncio.run(run())
+    assert version_names and last_week > 0 and lifetime > 0
+    assert len(breakdown) and len(snapshot.daily_downloads) and versions and latest.version_name
+
+
+def test_planner_rejects_async_clients():
+    with pytest.raises(TypeError):
+        planner.query(aio.AsyncNodePackage('', 'react', _FixtureSession()), ['downloads_last_week'])
+
+
+def test_async_session_shares_the_sync_transport(replay):
+    async def run():
+        async with aio.AsyncSession() as session:
+            return await aio.AsyncNodePackage('', 'react', session).version_names()
+
+    assert asyncio.run(run())
+    assert replay.request_count == 1
+    # the request drew on the same per-host bucket the sync clients use
+    assert list(fetch.transport._buckets) == ['127.0.0.1']
+
+
+class _ThrottlingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        if type(self).requests == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_async_session_retries_throttled_requests():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = Transport(max_retries=2)
+
+    async def run():
+        async with aio.AsyncSession(use_cache=False, transport=transport) as session:
+            return await session.get_json(f'http://127.0.0.1:{server.server_port}/throttled')
+
+    try:
+        assert asyncio.run(run()) == {'ok': True}
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert _ThrottlingHandler.requests == 2
+
+
+def test_async_requests_are_recorded_in_metrics(replay):
+    metrics.registry.reset()
+
+    async def run():
+        async with aio.AsyncSession() as session:
+            package = aio.AsyncNodePackage('', 'react', session)
+            await package.version_names()
+            await package.version_names()
+
+    asyncio.run(run())
+    entry = metrics.registry.stats()[('aio.AsyncSession.get_json', 'AsyncNodePackage.version_names')]
+    assert entry.calls == 2 and entry.requests == 1 and entry.cache_hits == 1
+    assert entry.response_bytes > 0
+
+
+def test_async_session_works_with_a_stand_in_transport(replay):
+    # the sync clients' transport is swapped for one without rate limits; async requests bring their own
+    previous = fetch.set_transport(_NoSyncRequests())
+
+    async def run():
+        async with aio.AsyncSession(use_cache=False) as session:
+            return await session.get_json(f'{replay.base_url}/pypistats.org/api/packages/requests/recent')
+
+    try:
+        assert asyncio.run(run())
+    finally:
+        fetch.set_transport(previous)
+    assert replay.request_count == 1
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import archive
+import ruby
+from csharp import NugetPackageClient, NugetPackageVersion
+from series import DownloadSeries
+
+
+def _series() -> dict[str, DownloadSeries]:
+    return {
+        archive.series_key('rubygems', 'rails', 'total_downloads'): DownloadSeries.from_pairs(
+            [('2024-01-01', 100), ('2024-01-02', 130)], stat_type=ruby.RubyGemDownloadStat),
+        archive.series_key('rubygems', 'rails', 'total_ranking'): DownloadSeries.from_pairs(
+            [('2024-01-02', 7)], stat_type=ruby.RubyGemRankingStat, value_name='rank'),
+        archive.series_key('npm', 'react', 'daily'): DownloadSeries.from_pairs([]),
+    }
+
+
+def test_series_round_trip(tmp_path):
+    path = str(tmp_path / 'stats.pkst')
+    series = _series()
+    archive.write_archive(path, series=series)
+
+    with archive.SeriesArchive(path) as stored:
+        assert len(stored) == 3
+        assert list(stored) == sorted(series)
+        for key, expected in series.items():
+            actual = stored[key]
+            assert actual.dates.tolist() == expected.dates.tolist()
+            assert actual.counts.tolist() == expected.counts.tolist()
+            assert actual.stat_type is expected.stat_type
+            assert actual.value_name == expected.value_name
+        assert stored.get('npm/vue/daily') is None
+        assert 'npm/vue/daily' not in stored
+        with pytest.raises(KeyError):
+            stored['npm/vue/daily']
+
+
+def test_empty_archive(tmp_path):
+    path = str(tmp_path / 'empty.pkst')
+    archive.write_archive(path)
+
+    with archive.SeriesArchive(path) as stored:
+        assert len(stored) == 0
+        assert list(stored) == []
+        assert stored.get('npm/react/daily') is None
+        assert stored.tables == []
+
+
+def test_sections_are_aligned_views_into_the_file(tmp_path):
+    path = str(tmp_path / 'stats.pkst')
+    archive.write_archive(path, series=_series())
+
+    with archive.SeriesArchive(path) as stored:
+        counts = stored['rubygems/rails/total_downloads'].counts
+        assert not counts.flags.owndata
+        assert all(section['offset'] % 8 == 0 for section in stored._sections.values())
+
+
+def test_string_and_int_table_columns(tmp_path):
+    path = str(tmp_path / 'tables.pkst')
+    names = ['Newtonsoft.Json', '', 'Ünïcödé.Package']
+    archive.write_archive(path, tables={'packages': {'name': names, 'downloads': [1, 2, 3]}})
+
+    with archive.SeriesArchive(path) as stored:
+        table = stored.table('packages')
+        assert list(table['name']) == names
+        assert table['name'][-1] == names[-1]
+        assert len(table['name']) == 3
+        assert table['downloads'].dtype == np.int64 and table['downloads'].tolist() == [1, 2, 3]
+
+
+def test_nuget_tables_round_trip(tmp_path):
+    path = str(tmp_path / 'nuget.pkst')
+    versions = [NugetPackageVersion('Newtonsoft.Json', '13.0.1', 300, {'6.0': 200, '5.0': 100}),
+                NugetPackageVersion('Newtonsoft.Json', '13.0.2', 50)]
+    clients = [NugetPackageClient('Newtonsoft.Json', '6.0', 250)]
+    archive.write_archive(path, tables={'versions': archive.nuget_versions_table(versions),
+                                        'version_clients': archive.nuget_version_clients_table(versions),
+                                        'clients': archive.nuget_clients_table(clients)})
+
+    with archive.SeriesArchive(path) as stored:
+        restored = archive.nuget_versions(stored, 'versions', 'version_clients')
+        restored_clients = archive.nuget_clients(stored, 'clients')
+
+    assert [(version.version, version.total_downloads, version.client_data) for version in restored] == \
+        [('13.0.1', 300, {'6.0': 200, '5.0': 100}), ('13.0.2', 50, {})]
+    assert [(client.client_version, client.total_downloads) for client in restored_clients] == [('6.0', 250)]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not-an-archive'
+    path.write_bytes(b'{"json": true}')
+
+    with pytest.raises(ValueError):
+        archive.SeriesArchive(str(path))
@@ -0,0 +1,85 @@
+import cache
+import fetch
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(monkeypatch, **kwargs) -> tuple[cache.ResponseCache, _Clock]:
+    clock = _Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return cache.ResponseCache(**kwargs), clock
+
+
+def test_entries_expire_after_their_host_ttl(monkeypatch):
+    response_cache, clock = _cache(monkeypatch, default_ttl=10, host_ttls={'pypistats.org': 60})
+    response_cache.set('https://pypistats.org/api/packages/requests/recent', 'pypistats')
+    response_cache.set('https://example.com/other', 'other')
+
+    clock.now += 30
+    assert response_cache.get('https://pypistats.org/api/packages/requests/recent') == 'pypistats'
+    assert response_cache.get('https://example.com/other') is None
+    assert len(response_cache) == 1
+    clock.now += 30
+    assert response_cache.get('https://pypistats.org/api/packages/requests/recent') is None
+
+
+def test_expired_entries_with_validators_stay_for_revalidation(monkeypatch):
+    response_cache, clock = _cache(monkeypatch)
+    response_cache.set('https://example.com/a', 'body', ttl=1, validators={'etag': '"1"'})
+    # nothing to cache without a lifetime unless it can be revalidated
+    response_cache.set('https://example.com/b', 'body', ttl=0)
+
+    clock.now += 2
+    assert response_cache.get('https://example.com/a') is None
+    assert response_cache.stale('https://example.com/a') == ('body', {'etag': '"1"'})
+    assert response_cache.stale('https://example.com/b') == (None, None)
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    response_cache, _ = _cache(monkeypatch, max_size=2)
+    response_cache.set('https://example.com/a', 'a')
+    response_cache.set('https://example.com/b', 'b')
+    response_cache.get('https://example.com/a')
+    response_cache.set('https://example.com/c', 'c')
+
+    assert response_cache.get('https://example.com/b') is None
+    assert response_cache.get('https://example.com/a') == 'a'
+    assert response_cache.get('https://example.com/c') == 'c'
+
+
+def test_invalidation(monkeypatch):
+    response_cache, _ = _cache(monkeypatch)
+    for key in ('https://a.example/x', 'https://a.example/y', 'https://b.example/x?page=1', 'https://b.example/z'):
+        response_cache.set(key, key)
+
+    assert response_cache.invalidate('https://a.example/x')
+    assert not response_cache.invalidate('https://a.example/x')
+    assert response_cache.invalidate_host('a.example') == 1
+    assert response_cache.invalidate_prefix('https://b.example/x') == 1
+    assert len(response_cache) == 1
+    response_cache.clear()
+    assert len(response_cache) == 0
+
+
+def test_make_key_sorts_params():
+    assert cache.make_key('https://example.com/a', {'b': 2, 'a': 1}) == 'https://example.com/a?a=1&b=2'
+    assert cache.make_key('https://example.com/a?x=1', {'a': 1}) == 'https://example.com/a?x=1&a=1'
+    assert cache.make_key('https://example.com/a') == 'https://example.com/a'
+
+
+def test_fetch_caches_until_invalidated(replay):
+    url = 'https://pypistats.org/api/packages/requests/recent'
+
+    first = fetch.get_json(url)
+    assert fetch.get_json(url) == first
+    assert replay.request_count == 1
+    assert fetch.invalidate(url)
+    fetch.get_json(url)
+    assert replay.request_count == 2
+    assert fetch.invalidate_host('pypistats.org') == 1
@@ -0,0 +1,41 @@
+import functools
+import json
+import os
+
+import crawler
+from benchmarks.replay import ReplayTransport
+from report import ManifestEntry
+
+
+def _row(package: str, value: int) -> dict:
+    return {'ecosystem': 'pypi', 'package': package, 'metric': 'downloads_lifetime', 'date': '', 'value': value}
+
+
+def test_resume_after_partial_write_keeps_checkpointed_rows(replay, tmp_path):
+    out_dir = str(tmp_path)
+    checkpointed, pending = ManifestEntry('pypi', 'a'), ManifestEntry('pypi', 'b')
+    # package a finished; the crash happened halfway through writing the next package's first row
+    with open(os.path.join(out_dir, 'shard-0.jsonl'), 'w') as file:
+        file.write(json.dumps(_row('a', 1)) + '\n' + json.dumps(_row('b', 2))[:30])
+    with open(os.path.join(out_dir, 'shard-0.done'), 'w') as file:
+        file.write(crawler.entry_key(checkpointed) + '\n' + 'pypi:')
+
+    collected, skipped, failed = crawler.crawl_shard(out_dir, 0, [checkpointed, pending], days=3, workers=1,
+                                                     transport_factory=functools.partial(ReplayTransport,
+                                                                                         replay.base_url))
+
+    assert (collected, skipped, failed) == (1, 1, 0)
+    packages = {row['package'] for row in crawler.merge(out_dir)}
+    assert packages == {'a', 'b'}
+    assert crawler.completed_keys(out_dir, 0) == {'pypi:a', 'pypi:b'}
+
+
+def test_trim_partial_line_leaves_complete_files_alone(tmp_path):
+    path = str(tmp_path / 'shard-0.jsonl')
+    with open(path, 'w') as file:
+        file.write('{"a": 1}\n')
+
+    crawler._trim_partial_line(path)
+
+    with open(path) as file:
+        assert file.read() == '{"a": 1}\n'
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from history import HistoryStore, NPM
+from node import NodePackage
+
+
+def _days_ago(days: int) -> datetime:
+    return datetime.now() - timedelta(days=days)
+
+
+def test_later_query_after_stored_range_leaves_no_hole(replay):
+    store = HistoryStore(':memory:')
+    package = NodePackage('', 'react', history=store)
+
+    package.downloads_between(_days_ago(90), _days_ago(80))
+    package.downloads_between(_days_ago(30), datetime.now())
+    stats = package.downloads_between(_days_ago(90), datetime.now())
+
+    assert len(stats) == 91
+    assert store.missing_range(NPM, 'react', _days_ago(90), _days_ago(1)) is None
+
+
+def test_hole_in_stored_range_is_fetched_again(replay):
+    store = HistoryStore(':memory:')
+    start = _days_ago(20)
+    store.save(NPM, 'react', [((start + timedelta(days=day)).strftime('%Y-%m-%d'), 1) for day in range(21)
+                              if day not in (5, 6)])
+
+    missing = store.missing_range(NPM, 'react', start, _days_ago(0))
+    assert missing[0].date() == (start + timedelta(days=5)).date()
+
+    stats = NodePackage('', 'react', history=store).downloads_between(start, datetime.now())
+    assert len(stats) == 21
+
+
+def test_stored_range_is_not_refetched(replay):
+    store = HistoryStore(':memory:')
+    package = NodePackage('', 'react', history=store)
+    package.downloads_between(_days_ago(60), _days_ago(10))
+    requests = replay.request_count
+
+    package.downloads_between(_days_ago(50), _days_ago(20))
+
+    assert replay.request_count == requests
+
+
+def test_refresh_start_after_last_day_starts_from_last_day():
+    store = HistoryStore(':memory:')
+    store.save(NPM, 'react', [('2024-01-01', 1), ('2024-01-02', 2)])
+
+    assert store.refresh_start(NPM, 'react', start_date=datetime(2024, 3, 1)) == datetime(2024, 1, 2)
+    assert store.refresh_start(NPM, 'react', start_date=datetime(2023, 12, 1)) == datetime(2023, 12, 1)
@@ -0,0 +1,31 @@
+import sys
+
+import metrics
+import python
+
+
+def _frame_in(module: str, name: str, body):
+    # a function called name whose globals claim it lives in module, so _public_caller treats it as that module's
+    namespace = {'__name__': module, 'body': body}
+    exec(f'def {name}():\n    return body()\n', namespace)
+    return namespace[name]
+
+
+def test_caller_is_the_public_client_method(replay):
+    metrics.registry.reset()
+    package = python.PythonPackage('requests')
+
+    assert package.downloads_yesterday > 0
+    assert package.downloads_yesterday > 0
+    stats = metrics.registry.stats()
+    entry = stats[('python._pypi_stats_info_api_call', 'PythonPackage.downloads_yesterday')]
+    assert entry.calls == 2 and entry.requests == 1 and entry.cache_hits == 1
+
+
+def test_caller_walk_stops_at_the_first_non_client_frame():
+    inner = _frame_in('node', 'inner', lambda: metrics._public_caller(sys._getframe(1)))
+    outer = _frame_in('python', 'outer', lambda: inner())
+
+    # the lambda between outer and inner lives in this module, so outer is never reached
+    assert outer() == 'inner'
+    assert _frame_in('python', 'outer', inner)() == 'outer'
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import aio
+import fetch
+import node
+
+
+def test_versions_keep_manifests_from_packument(replay):
+    versions = node.NodePackage('', 'react').versions
+    requests = replay.request_count
+
+    manifests = [version.downloads for version in versions]
+
+    assert replay.request_count == requests
+    assert all(manifest['version'] == version.version_name for manifest, version in zip(manifests, versions))
+
+
+def test_compact_versions_fetch_manifest_on_access(replay):
+    version = node.NodePackage('', 'react', compact=True).versions[0]
+    requests = replay.request_count
+
+    assert version.downloads['version'] == version.version_name
+    assert replay.request_count == requests + 1
+
+
+def test_invalidate_drops_every_variant_of_the_packument(replay):
+    package = node.NodePackage('', 'react', compact=True)
+    package.versions
+    package.version_names
+    requests = replay.request_count
+
+    assert fetch.invalidate(node._info_url('react'))
+    assert not fetch.invalidate(node._info_url('react'))
+    package.versions
+    package.version_names
+    assert replay.request_count == requests + 2
+
+
+def test_range_tasks_respect_single_and_bulk_limits():
+    package_strs = [f'package-{i}' for i in range(131)] + ['@scope/package']
+    start, end = datetime(2021, 1, 1), datetime(2023, 12, 31)
+
+    tasks = node._range_tasks(package_strs, start, end)
+
+    for batch, chunk_start, chunk_end in tasks:
+        days = (chunk_end - chunk_start).days + 1
+        assert days <= (node.MAX_RANGE_DAYS if len(batch) == 1 else node.MAX_BULK_RANGE_DAYS)
+    covered = {}
+    for batch, chunk_start, chunk_end in tasks:
+        for package_str in batch:
+            covered[package_str] = covered.get(package_str, 0) + (chunk_end - chunk_start).days + 1
+    assert set(covered) == set(package_strs)
+    assert set(covered.values()) == {(end - start).days + 1}
+
+
+def test_async_downloads_between_is_chunked():
+    requested = []
+
+    class Session:
+        async def get_json(self, url: str, params: dict = None):
+            requested.append(url)
+            start, end = (date.fromisoformat(day) for day in url.split('/')[-2].split(':'))
+            return {'downloads': [{'day': (start + timedelta(days=offset)).isoformat(), 'downloads': 1}
+                                  for offset in range((end - start).days + 1)]}
+
+    package = aio.AsyncNodePackage('', 'react', session=Session())
+    stats = asyncio.run(package.downloads_between(datetime(2021, 1, 1), datetime(2023, 12, 31)))
+
+    assert len(requested) == 3
+    assert len(stats) == (date(2023, 12, 31) - date(2021, 1, 1)).days + 1
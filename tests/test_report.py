@@ -0,0 +1,24 @@
+import pytest
+
+import report
+
+
+def _daily_rows(rows: list[dict]) -> list[dict]:
+    return [row for row in rows if row['metric'] == 'daily_downloads']
+
+
+@pytest.mark.parametrize('ecosystem, author', [('pypi', None), ('npm', None), ('packagist', 'laravel'),
+                                               ('rubygems', None)])
+def test_days_limits_the_daily_rows(replay, ecosystem, author):
+    entry = report.ManifestEntry(ecosystem, 'framework' if author else 'rails', author=author)
+    collector = report.COLLECTORS[ecosystem]
+
+    assert len(_daily_rows(collector(entry, 3))) == 3
+    rows = collector(entry, 0)
+    assert rows and not _daily_rows(rows)
+
+
+def test_negative_days_are_rejected(capsys):
+    with pytest.raises(SystemExit):
+        report.main(['manifest.json', '--days', '-1'])
+    assert 'at least 0' in capsys.readouterr().err
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import ruby
+from series import DownloadSeries
+
+
+def _totals(pairs: list[tuple[str, int]]) -> DownloadSeries:
+    return DownloadSeries.from_pairs(pairs, stat_type=ruby.RubyGemDownloadStat)
+
+
+def _ranking(pairs: list[tuple[str, int]]) -> DownloadSeries:
+    return DownloadSeries.from_pairs(pairs, stat_type=ruby.RubyGemRankingStat, value_name='rank')
+
+
+def test_derive_daily_downloads_folds_gaps_and_clips_corrections():
+    totals = _totals([('2024-01-01', 100), ('2024-01-02', 130), ('2024-01-05', 190), ('2024-01-06', 180)])
+
+    daily = ruby._derive_daily_downloads(totals)
+
+    assert [str(day) for day in daily.dates] == ['2024-01-02', '2024-01-05', '2024-01-06']
+    assert daily.counts.tolist() == [30, 60, 0]
+    assert daily.stat_type is ruby.RubyGemDownloadStat
+
+
+def test_downloads_between_uses_the_cumulative_totals():
+    snapshot = ruby.RubyGemSnapshot('rails', _totals([('2024-01-01', 100), ('2024-01-02', 130),
+                                                      ('2024-01-05', 190), ('2024-01-06', 200)]))
+
+    assert snapshot.downloads_between(datetime(2024, 1, 2), datetime(2024, 1, 5)) == 90
+    # days missing upstream count from the last total before them
+    assert snapshot.downloads_between(datetime(2024, 1, 3), datetime(2024, 1, 4)) == 0
+    assert snapshot.downloads_between(datetime(2024, 1, 3), datetime(2024, 1, 10)) == 70
+    # before the first total there is nothing to compare against
+    assert snapshot.downloads_between(datetime(2023, 12, 1), datetime(2024, 1, 2)) == 30
+    assert snapshot.downloads_between(datetime(2024, 1, 3), datetime(2024, 1, 2)) == 0
+    assert ruby.RubyGemSnapshot('empty', _totals([])).downloads_between(datetime(2024, 1, 1),
+                                                                        datetime(2024, 1, 2)) == 0
+
+
+def test_rank_change_is_positive_when_the_gem_climbs():
+    snapshot = ruby.RubyGemSnapshot('rails', _totals([]), total_ranking=_ranking([
+        ('2024-01-01', 50), ('2024-01-02', 40), ('2024-01-04', 45)]), daily_ranking=_ranking([]))
+
+    assert snapshot.rank_change(datetime(2024, 1, 1), datetime(2024, 1, 2)) == 10
+    assert snapshot.rank_change(datetime(2024, 1, 2), datetime(2024, 1, 10)) == -5
+    assert snapshot.rank_change(datetime(2023, 12, 1), datetime(2024, 1, 3)) == 10
+    assert snapshot.rank_change(datetime(2024, 1, 1), datetime(2024, 1, 2), kind='daily') == 0
+
+
+def test_best_rank_of_an_empty_ranking_is_none():
+    snapshot = ruby.RubyGemSnapshot('rails', _totals([]), total_ranking=_ranking([]))
+
+    assert snapshot.best_rank() is None
+    assert snapshot.best_rank(start_date=datetime(2024, 1, 1)) is None
+    assert snapshot.best_rank(end_date=datetime(2024, 1, 1)) is None
+
+
+def test_snapshot_matches_the_separate_endpoints(replay):
+    gem = ruby.RubyGem('rails')
+    snapshot = gem.snapshot()
+    totals = gem.total_downloads
+    start, end = (datetime.fromisoformat(totals[index].date) for index in (1, -1))
+
+    assert snapshot.daily_downloads.sum() == totals.counts[-1] - totals.counts[0]
+    assert snapshot.downloads_between(start, end) == totals.counts[-1] - totals.counts[0]
+    assert snapshot.rank_change(start, end) == gem.total_ranking.as_of(start) - gem.total_ranking.as_of(end)
+    # the separate endpoint calls were answered from the cache the snapshot filled
+    assert replay.request_count == 3
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+import fetch
+import metrics
+from singleflight import SingleFlight
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    results = []
+
+    def leader():
+        calls.append('leader')
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    def follower():
+        calls.append('follower')
+        return 'unexpected'
+
+    leader_thread = threading.Thread(target=lambda: results.append(flight.do('key', leader)))
+    leader_thread.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', follower))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    # the followers are blocked on the leader; give them time to join before it finishes
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader_thread] + followers:
+        thread.join(5)
+
+    assert calls == ['leader']
+    assert sorted(results, key=lambda result: result[1]) == [('result', False)] + [('result', True)] * 4
+    assert flight.in_flight() == 0
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    error = ValueError('upstream failed')
+    raised = []
+
+    def leader():
+        started.set()
+        release.wait(5)
+        raise error
+
+    def call(func):
+        try:
+            flight.do('key', func)
+        except ValueError as e:
+            raised.append(e)
+
+    leader_thread = threading.Thread(target=call, args=(leader,))
+    leader_thread.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call, args=(lambda: None,)) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader_thread] + followers:
+        thread.join(5)
+
+    assert raised == [error] * 4
+    # the failed call is not remembered; the next caller runs again
+    assert flight.do('key', lambda: 'retried') == ('retried', False)
+
+
+def test_keys_do_not_share():
+    flight = SingleFlight()
+
+    assert flight.do('a', lambda: 1) == (1, False)
+    assert flight.do('b', lambda: 2) == (2, False)
+
+
+class _SlowTransport:
+    # a stand-in transport that holds every request long enough for concurrent callers to pile up
+    def __init__(self):
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get_json(self, url: str, params: dict = None):
+        with self._lock:
+            self.requests += 1
+        time.sleep(0.1)
+        return {'url': url}
+
+
+@pytest.fixture
+def slow_transport():
+    transport = _SlowTransport()
+    previous = fetch.set_transport(transport)
+    fetch.clear_cache()
+    try:
+        yield transport
+    finally:
+        fetch.set_transport(previous)
+        fetch.clear_cache()
+
+
+def test_concurrent_fetches_send_one_request(slow_transport):
+    url = 'https://api.npmjs.org/downloads/point/last-week/react'
+    results = []
+    events = []
+
+    @metrics.instrument
+    def call():
+        results.append(fetch.get_json(url))
+        events.append(metrics.current_event())
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert slow_transport.requests == 1
+    assert results == [{'url': url}] * 8
+    assert sum(event.coalesced + event.cache_hits for event in events) == 7
+
+
+def test_leader_rechecks_the_cache(slow_transport, monkeypatch):
+    # another leader filled the cache after this caller's first look but before it joined
+    url = 'https://api.npmjs.org/downloads/point/last-week/react'
+    fetch.response_cache.set(url, {'cached': True})
+    get = fetch.response_cache.get
+    looks = []
+
+    def first_look_misses(key, default=None):
+        looks.append(key)
+        return None if len(looks) == 1 else get(key, default)
+
+    monkeypatch.setattr(fetch.response_cache, 'get', first_look_misses)
+
+    assert fetch.get_json(url) == {'cached': True}
+    assert slow_transport.requests == 0
+    assert len(looks) == 2
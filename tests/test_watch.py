@@ -0,0 +1,31 @@
+import fetch
+import python
+import watch
+
+
+def test_every_poll_revalidates_once(replay):
+    watcher = watch.Watcher()
+    # both metrics read the same pypistats endpoint
+    watched = watcher.watch(python.PythonPackage('requests'), metrics=('downloads_last_week', 'downloads_last_month'),
+                            interval=60)
+    now = watcher.next_due()
+
+    for poll in range(4):
+        assert watcher.poll_due(now + poll * watched.interval) == []
+        assert replay.request_count == poll + 1
+        # the first poll fills the cache; each later one is a single conditional request answered 304
+        assert replay.not_modified == poll
+    assert watched.errors == 0
+
+
+def test_revalidate_goes_upstream_once_per_key(replay):
+    url = 'https://pypistats.org/api/packages/requests/recent'
+    fetch.get_json(url)
+
+    with fetch.revalidate():
+        fetch.get_json(url)
+        fetch.get_json(url)
+    fetch.get_json(url)
+
+    assert replay.request_count == 2
+    assert replay.not_modified == 1
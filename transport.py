@@ -0,0 +1,206 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (requests per second, burst) per host; pypistats and pepy throttle aggressively
+HOST_RATES = {
+    'pypistats.org': (0.5, 5),
+    'api.pepy.tech': (10 / 60, 5),
+    'bestgems.org': (2, 5),
+}
+DEFAULT_RATE = (10, 20)
+
+# returned by Transport.get_conditional when the server answers 304
+NOT_MODIFIED = object()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).hostname or ''
+
+
+def _retry_after(response) -> Optional[float]:
+    # response is a requests or an aiohttp response; both expose headers the same way
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _validators(response: requests.Response) -> Optional[dict]:
+    validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    return {name: value for name, value in validators.items() if value} or None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # takes a token now and returns how long to wait before using it, so async callers can sleep without
+        # holding the lock; the tokens go negative while callers are queued
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return max(-self._tokens / self.rate, 0.0)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        # drain the bucket so every caller waits out a server-imposed cool-down
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class Transport:
+    def __init__(self, host_rates: dict = None, default_rate: tuple = DEFAULT_RATE, max_retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 60, timeout: float = 30, pool_size: int = 10,
+                 headers: dict = None):
+        self.host_rates = dict(HOST_RATES if host_rates is None else host_rates)
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.headers = headers or {}
+        self._sessions = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(self.headers)
+                self._sessions[host] = session
+            return session
+
+    def bucket(self, url: str) -> TokenBucket:
+        # shared by every request to the URL's host, sync or async
+        host = _host(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(*self.host_rates.get(host, self.default_rate))
+            return bucket
+
+    def _delay(self, attempt: int) -> float:
+        # full jitter keeps many workers from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def retry_delay(self, attempt: int, bucket: TokenBucket, response=None) -> float:
+        # Seconds to wait before retry number attempt + 1, after a retryable response or, without one, a connection
+        # error. Shared with aio.AsyncSession so sync and async requests back off the same way.
+        delay = _retry_after(response) if response is not None else None
+        if delay is None:
+            return self._delay(attempt)
+        delay = min(delay, self.max_backoff)
+        bucket.pause(delay)
+        return delay
+
+    def resolve(self, url: str) -> str:
+        # the URL actually requested; benchmarks redirect it to a local server
+        return url
+
+    def get(self, url: str, params: dict = None, headers: dict = None, stream: bool = False) -> requests.Response:
+        url = self.resolve(url)
+        session = self._session(_host(url))
+        bucket = self.bucket(url)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.retry_delay(attempt, bucket))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                response.raise_for_status()
+                return response
+            delay = self.retry_delay(attempt, bucket, response)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _read(self, response: requests.Response, started: float, parser: Callable = None):
+        received = time.perf_counter()
+        try:
+            if parser is None:
+                data = response.json()
+                size = len(response.content)
+            else:
+                response.raw.decode_content = True
+                data = parser(response.raw)
+                size = response.raw.tell()
+            metrics.observe_response(request_seconds=received - started, response_bytes=size,
+                                     parse_seconds=time.perf_counter() - received)
+        finally:
+            response.close()
+        return data
+
+    def get_json(self, url: str, params: dict = None, headers: dict = None):
+        started = time.perf_counter()
+        return self._read(self.get(url, params=params, headers=headers), started)
+
+    def get_parsed(self, url: str, parser: Callable, params: dict = None, headers: dict = None):
+        # hands the undecoded body to parser as a file object so large documents never sit in memory whole
+        started = time.perf_counter()
+        return self._read(self.get(url, params=params, headers=headers, stream=True), started, parser)
+
+    def get_conditional(self, url: str, params: dict = None, headers: dict = None, validators: dict = None,
+                        parser: Callable = None) -> tuple:
+        # Returns (data, validators). With validators from an earlier response the request is conditional,
+        # and a 304 returns (NOT_MODIFIED, validators) without reading or parsing a body.
+        request_headers = dict(headers or {})
+        if validators:
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+        started = time.perf_counter()
+        response = self.get(url, params=params, headers=request_headers or None, stream=parser is not None)
+        if response.status_code == 304:
+            response.close()
+            metrics.observe_not_modified(request_seconds=time.perf_counter() - started)
+            return NOT_MODIFIED, validators
+        return self._read(response, started, parser), _validators(response)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
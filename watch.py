@@ -0,0 +1,167 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import fetch
+from PHP import PHPPackage
+from csharp import NugetPackage
+from metrics import bind_caller
+from node import NodePackage
+from python import PythonPackage
+from ruby import RubyGem
+from series import DownloadSeries
+
+# Seconds between polls, matched to how often each source publishes new numbers. Every poll revalidates what it
+# reads instead of trusting the response cache, whose TTLs for these hosts are as long as the intervals, so a poll
+# mostly gets 304s back and a change is seen within one interval.
+POLL_INTERVALS = {
+    PythonPackage: 3600,
+    PHPPackage: 900,
+    NodePackage: 900,
+    NugetPackage: 3600,
+    RubyGem: 3600,
+}
+DEFAULT_POLL_INTERVAL = 900
+
+DEFAULT_METRICS = {
+    PythonPackage: ('downloads_lifetime', 'downloads_yesterday', 'downloads_last_week', 'downloads_last_month'),
+    PHPPackage: ('total_downloads_lifetime', 'average_daily_downloads_lifetime'),
+    NodePackage: ('downloads_yesterday', 'downloads_last_week', 'downloads_last_month'),
+    NugetPackage: ('recent_total_downloads',),
+    RubyGem: ('total_downloads', 'total_ranking'),
+}
+
+
+def _label(package) -> str:
+    for attribute in ('package_str', 'package_name', 'gem_name'):
+        value = getattr(package, attribute, None)
+        if value:
+            return value
+    return repr(package)
+
+
+def _value(package, metric: str) -> Any:
+    value = getattr(package, metric)
+    if isinstance(value, DownloadSeries):
+        # series metrics are watched through their latest value
+        return int(value.counts[-1]) if len(value) else None
+    return value
+
+
+class ChangeEvent:
+    __slots__ = ('package', 'metric', 'previous', 'current', 'observed_at')
+
+    def __init__(self, package: str, metric: str, previous: Any, current: Any, observed_at: datetime):
+        self.package = package
+        self.metric = metric
+        self.previous = previous
+        self.current = current
+        self.observed_at = observed_at
+
+    def __repr__(self) -> str:
+        return f'ChangeEvent({self.package}.{self.metric}: {self.previous} -> {self.current})'
+
+
+class WatchedPackage:
+    __slots__ = ('package', 'label', 'metrics', 'interval', 'values', 'errors')
+
+    def __init__(self, package, metrics: tuple, interval: float):
+        self.package = package
+        self.label = _label(package)
+        self.metrics = metrics
+        self.interval = interval
+        self.values = {}
+        self.errors = 0
+
+
+class Watcher:
+    def __init__(self, on_change: Callable[[ChangeEvent], None] = None, max_workers: int = 8,
+                 on_error: Callable[[WatchedPackage, Exception], None] = None):
+        self.on_change = on_change
+        self.on_error = on_error
+        self.max_workers = max_workers
+        self._schedule = []
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def watch(self, package, metrics: tuple = None, interval: float = None) -> WatchedPackage:
+        package_type = type(package)
+        watched = WatchedPackage(package=package,
+                                 metrics=tuple(metrics or DEFAULT_METRICS.get(package_type, ())),
+                                 interval=interval or POLL_INTERVALS.get(package_type, DEFAULT_POLL_INTERVAL))
+        self._push(time.monotonic(), watched)
+        return watched
+
+    def _push(self, due: float, watched: WatchedPackage):
+        with self._lock:
+            # the counter breaks ties so heapq never compares two WatchedPackage objects
+            heapq.heappush(self._schedule, (due, self._counter, watched))
+            self._counter += 1
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._schedule[0][0] if self._schedule else None
+
+    def _poll(self, watched: WatchedPackage) -> list[ChangeEvent]:
+        events = []
+        with fetch.revalidate():
+            values = {metric: _value(watched.package, metric) for metric in watched.metrics}
+        for metric, current in values.items():
+            # the first observation only sets the baseline
+            seen = metric in watched.values
+            previous = watched.values.get(metric)
+            watched.values[metric] = current
+            if seen and previous != current:
+                events.append(ChangeEvent(package=watched.label, metric=metric, previous=previous, current=current,
+                                          observed_at=datetime.now()))
+        return events
+
+    def poll_due(self, now: float = None) -> list[ChangeEvent]:
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                due.append(heapq.heappop(self._schedule)[2])
+        if not due:
+            return []
+
+        def poll(watched: WatchedPackage) -> list[ChangeEvent]:
+            try:
+                return self._poll(watched)
+            except Exception as e:
+                watched.errors += 1
+                if self.on_error:
+                    self.on_error(watched, e)
+                return []
+
+        events = []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(due)))) as executor:
+            for watched, watched_events in zip(due, executor.map(bind_caller(poll), due)):
+                self._push(now + watched.interval, watched)
+                events.extend(watched_events)
+        if self.on_change:
+            for event in events:
+                self.on_change(event)
+        return events
+
+    def run(self, until: float = None):
+        # polls until stop() is called or, with until, that many seconds have passed
+        deadline = time.monotonic() + until if until is not None else None
+        self._stop.clear()
+        while not self._stop.is_set():
+            self.poll_due()
+            next_due = self.next_due()
+            now = time.monotonic()
+            wait = max(next_due - now, 0) if next_due is not None else 1.0
+            if deadline is not None:
+                if now >= deadline:
+                    return
+                wait = min(wait, deadline - now)
+            self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()